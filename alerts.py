@@ -0,0 +1,120 @@
+import os
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+import pandas as pd
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from model import need_alert
+from throttle import alert_key
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'email')
+TEMPLATE_NAMES = ['alert.html', 'alert.txt', 'digest.html', 'digest.txt']
+
+# Compiled once at import; HTML templates autoescape everything interpolated into them
+_env = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=select_autoescape(['html']),
+                   trim_blocks=True, lstrip_blocks=True)
+TEMPLATES = {name: _env.get_template(name) for name in TEMPLATE_NAMES}
+
+DIGEST_COLUMNS = ['RNO', 'NAME', 'DEPT', 'YEAR', 'PERFORMANCE_LABEL', 'RISK_LABEL', 'DROPOUT_LABEL']
+
+
+def _labels(df, column):
+    if column not in df.columns:
+        return pd.Series("", index=df.index)
+    return df[column].fillna("").astype(str).str.strip().str.lower()
+
+
+def alert_mask(df):
+    """Boolean array: which rows meet the mentor alert rule, based on their stored labels.
+
+    This is the rule /api/student/predict applies to a stored student, shared by the digest
+    and the early-warning scanner so all three agree on who is at risk.
+    """
+    return need_alert(_labels(df, 'PERFORMANCE_LABEL').to_numpy(),
+                      _labels(df, 'RISK_LABEL').to_numpy(),
+                      _labels(df, 'DROPOUT_LABEL').to_numpy())
+
+
+def flagged_students(df):
+    """Rows of a student frame that meet the mentor alert rule, based on their stored labels"""
+    if df.empty:
+        return df
+    return df[alert_mask(df)]
+
+
+def group_by_mentor(df):
+    """Split flagged students into {mentor_email: (mentor_name, rows)} plus the rows without a mentor email"""
+    emails = df['MENTOR_EMAIL'].fillna("").astype(str).str.strip() if 'MENTOR_EMAIL' in df.columns \
+        else pd.Series("", index=df.index)
+    groups = {}
+    for email, rows in df[emails != ""].groupby(emails[emails != ""], sort=True):
+        names = rows['MENTOR'].dropna().astype(str) if 'MENTOR' in rows.columns else pd.Series(dtype=str)
+        groups[email] = (names.iloc[0] if len(names) else "", rows)
+    return groups, df[emails == ""]
+
+
+def digest_rows(rows):
+    """Plain dicts for the students listed in a digest"""
+    out = rows.reindex(columns=DIGEST_COLUMNS).astype(object)
+    out = out.where(pd.notna(out), "")
+    return [{k: str(v) for k, v in r.items()} for r in out.to_dict('records')]
+
+
+def digest_labels(student):
+    """Label tuple of a digest row, in the order the single-student alert uses"""
+    return (student['PERFORMANCE_LABEL'], student['RISK_LABEL'], student['DROPOUT_LABEL'])
+
+
+def _message(sender, recipient, subject, template, **context):
+    msg = MIMEMultipart('alternative')
+    msg['From'] = sender
+    msg['To'] = recipient
+    # Names come from user input; keep them from starting new header lines
+    msg['Subject'] = " ".join(subject.splitlines())
+    # Plain text first so clients that can render HTML prefer the last part
+    msg.attach(MIMEText(TEMPLATES[f"{template}.txt"].render(**context), 'plain'))
+    msg.attach(MIMEText(TEMPLATES[f"{template}.html"].render(**context), 'html'))
+    return msg
+
+
+def build_alert_message(sender, mentor_email, student_name, student_rno, performance, risk, dropout):
+    """Single-student mentor alert"""
+    subject = f"🚨 EduMetric Alert: {student_name} ({student_rno}) - Immediate Attention Required"
+    return _message(sender, mentor_email, subject, "alert", student_name=student_name, student_rno=student_rno,
+                    performance=str(performance), risk=str(risk), dropout=str(dropout))
+
+
+def build_digest_message(sender, mentor_email, mentor_name, students):
+    """One email listing every flagged mentee of a mentor"""
+    subject = f"EduMetric Digest: {len(students)} student(s) need your attention"
+    return _message(sender, mentor_email, subject, "digest", mentor_name=mentor_name, students=students)
+
+
+def queue_digests(flagged, sender, outbox, throttle, kind="digest"):
+    """Queue one digest per mentor for the flagged rows, skipping what the throttle suppresses.
+
+    Returns (queued, suppressed, unassigned): a summary per queued email, suppressed counts
+    by reason, and the RNOs that have no mentor email.
+    """
+    groups, unassigned = group_by_mentor(flagged)
+    queued = []
+    suppressed = {"duplicate": 0, "rate_limited": 0}
+    for mentor_email, (mentor_name, rows) in groups.items():
+        students = digest_rows(rows)
+        admitted, reason, duplicates = throttle.admit(mentor_email, [(s['RNO'], digest_labels(s)) for s in students])
+        suppressed["duplicate"] += duplicates
+        if reason == "rate_limited":
+            suppressed["rate_limited"] += len(students) - duplicates
+        if not admitted:
+            continue
+        fresh = {rno for rno, _ in admitted}
+        students = [s for s in students if s['RNO'] in fresh]
+        keys = [alert_key(rno, mentor_email, labels) for rno, labels in admitted]
+        try:
+            msg = build_digest_message(sender, mentor_email, mentor_name, students)
+            alert_id = outbox.enqueue(msg, kind=kind, meta={
+                "mentor_email": mentor_email, "rnos": [s['RNO'] for s in students], "throttle_keys": keys})
+        except Exception:
+            throttle.release(keys)
+            raise
+        queued.append({"mentor_email": mentor_email, "students": len(students), "alert_id": alert_id})
+    return queued, suppressed, unassigned['RNO'].astype(str).tolist() if len(unassigned) else []
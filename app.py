@@ -1,43 +1,38 @@
 import os
+import time
+import uuid
+import threading
+from datetime import datetime, timezone
 import pandas as pd
 from flask import Flask, jsonify, request, render_template
-import requests
 from dotenv import load_dotenv
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import db
+from model import load_model, student_features, need_alert, FEATURES, SCORES, HEADS
+from simulate import whatif_grid, cohort_intervention
+from snapshot import snapshot
+from scanner import EarlyWarningScanner
+from ingest import (read_upload_chunks, run_pipeline, estimate_rows, prepare_records, to_records, written_mask,
+                    CHUNK_SIZE, SUPPORTED_EXTENSIONS, STUDENT_COLUMNS, MAX_REPORTED_ERRORS)
+from checkpoints import ImportCheckpoints, file_hash
+from jobs import JobQueue
+from mailer import smtp_pool
+from outbox import outbox
+from alerts import flagged_students, queue_digests, build_alert_message
+from throttle import throttle, alert_key
+from scheduler import NightlySweep
 
 load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'fallback-key')
+DEBUG = os.getenv('DEBUG', 'True').lower() == 'true'
 
-SUPABASE_URL = os.getenv('SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_KEY')
-
-def get_supabase_data():
-    try:
-        url = f"{SUPABASE_URL}/rest/v1/students?select=*"
-        headers = {
-            'apikey': SUPABASE_KEY,
-            'Authorization': f'Bearer {SUPABASE_KEY}',
-            'Accept': 'application/json'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=20)
-        
-        if response.status_code == 200:
-            data = response.json()
-            if data:
-                df = pd.DataFrame(data)
-                df.columns = df.columns.str.upper()
-                return df
-        
-        return pd.DataFrame()
-        
-    except Exception as e:
-        print(f"Error: {e}")
-        return pd.DataFrame()
+# Loaded once at startup; scoring is a single matrix multiply per request
+MODEL = load_model()
+scanner = EarlyWarningScanner(snapshot)
+jobs = JobQueue()
+nightly_sweep = NightlySweep(MODEL, snapshot)
+UPLOAD_DIR = os.getenv('UPLOAD_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'uploads'))
 
 def analyze_subset(df):
     if df.empty:
@@ -93,33 +88,97 @@ def analyze_subset(df):
 
     return {"stats": stats, "label_counts": label_counts, "table": table}
 
-@app.route("/")
-def index():
+ANALYSIS_CACHE_SIZE = 256
+# (frame, {filter: result}); replaced as a whole, never iterated, so request threads can share it
+_analysis_cache = (None, {})
+
+def cached_analysis(dept=None, year=None):
+    """analyze_subset over a snapshot slice, reused until the snapshot frame is replaced"""
+    global _analysis_cache
+    df = snapshot.frame()
+    frame, results = _analysis_cache
+    if frame is not df:
+        # Every refresh or write swaps in a new frame, which retires all cached results at once
+        results = {}
+        _analysis_cache = (df, results)
+    key = (str(dept or "").strip().upper(), str(year or "").strip())
+    res = results.get(key)
+    if res is None:
+        res = analyze_subset(snapshot.slice(dept, year))
+        if len(results) < ANALYSIS_CACHE_SIZE:
+            results[key] = res
+    return res
+
+# Set by warmup(); /readyz reports 503 until the instance has loaded and primed its data
+readiness = {"ready": False, "started_at": None, "warmed_at": None, "warmup_seconds": None, "error": None}
+# An empty first load usually means Supabase was unreachable; only a deliberately empty table may serve
+READY_ALLOW_EMPTY = os.getenv('READY_ALLOW_EMPTY', 'False').lower() == 'true'
+WARMUP_RETRY_SECONDS = int(os.getenv('WARMUP_RETRY_SECONDS', 30))
+
+def warmup():
+    """Load the snapshot and prime the aggregates and templates before serving traffic"""
+    start = time.time()
+    readiness.update(started_at=start, error=None)
     try:
-        df = get_supabase_data()
-        # Include all departments from Supabase data
-        departments = sorted(df['DEPT'].unique().tolist()) if not df.empty and 'DEPT' in df.columns else ['CSE', 'ECE', 'MECH', 'CIVIL', 'EEE', 'CSE(AI)', 'CDS']
-        years = sorted(df['YEAR'].unique().tolist()) if not df.empty and 'YEAR' in df.columns else ['1', '2', '3', '4']
-        
-        return render_template('index.html', 
-                             DEBUG=True,
-                             departments=departments, 
-                             years=years)
+        rows = snapshot.refresh()
+        if not rows and not READY_ALLOW_EMPTY:
+            raise RuntimeError("No students loaded (Supabase unreachable or table empty); "
+                               "set READY_ALLOW_EMPTY=True to serve an empty table")
+        df = snapshot.frame()
+        cached_analysis()
+        for column, arg in (("DEPT", "dept"), ("YEAR", "year")):
+            if column in df.columns:
+                for value in df[column].dropna().astype(str).unique():
+                    cached_analysis(**{arg: value})
+        app.jinja_env.get_template('index.html')
+        readiness.update(ready=True, warmed_at=time.time(), warmup_seconds=round(time.time() - start, 2))
+        print(f"[INFO] Warmed up with {rows} students in {readiness['warmup_seconds']}s")
     except Exception as e:
-        return render_template('index.html', DEBUG=True, departments=['CSE', 'ECE', 'MECH', 'CIVIL', 'EEE', 'CSE(AI)', 'CDS'], years=['1', '2', '3', '4'])
+        readiness["error"] = str(e)
+        print(f"[ERR] Warmup failed: {e}")
+    return readiness["ready"]
+
+def warmup_until_ready():
+    while not warmup():
+        time.sleep(WARMUP_RETRY_SECONDS)
+
+@app.route("/healthz")
+def healthz():
+    """Liveness: the process is up and answering requests"""
+    return jsonify({"status": "ok"})
+
+@app.route("/readyz")
+def readyz():
+    """Readiness: the snapshot is loaded and the caches are primed"""
+    age = snapshot.age()
+    body = {
+        "ready": readiness["ready"],
+        "snapshot_rows": len(snapshot.df),
+        "snapshot_age_seconds": round(age, 1) if age is not None else None,
+        "warmup_seconds": readiness["warmup_seconds"],
+        "error": readiness["error"],
+    }
+    return jsonify(body), 200 if readiness["ready"] else 503
+
+# Shown until the snapshot has loaded, so the landing page never waits on Supabase
+DEFAULT_DEPARTMENTS = ['CSE', 'ECE', 'MECH', 'CIVIL', 'EEE', 'CSE(AI)', 'CDS']
+DEFAULT_YEARS = [1, 2, 3, 4]
+
+@app.route("/")
+def index():
+    # Read from the dimension cache only; no student rows are fetched or scanned here
+    dims = snapshot.dimensions()
+    return render_template('index.html',
+                         DEBUG=DEBUG,
+                         departments=dims["departments"] or DEFAULT_DEPARTMENTS,
+                         years=dims["years"] or DEFAULT_YEARS)
 
 @app.route("/api/stats")
 def api_stats():
     try:
-        df = get_supabase_data()
-        if df.empty:
-            return jsonify({"total_students": 0, "departments": [], "years": []})
-        
-        return jsonify({
-            'total_students': len(df),
-            'departments': sorted(df['DEPT'].unique().tolist()) if 'DEPT' in df.columns else [],
-            'years': sorted(df['YEAR'].unique().tolist()) if 'YEAR' in df.columns else []
-        })
+        if not snapshot.dimensions()["loaded"]:
+            snapshot.frame()
+        return jsonify(snapshot.dimensions())
     except Exception as e:
         return jsonify({"total_students": 0, "departments": [], "years": []}), 500
 
@@ -130,21 +189,13 @@ def api_dept():
         dept = data.get("dept", None)
         year = data.get("year", None)
 
-        df = get_supabase_data()
-        
-        if df.empty:
+        if snapshot.frame().empty:
             return jsonify({"success": False, "message": "No data available"}), 400
-        
-        if dept and dept != "":
-            df = df[df["DEPT"].astype(str).str.upper() == str(dept).upper()]
 
-        if year not in (None, "", "all"):
-            df = df[df["YEAR"].astype(str) == str(year)]
-
-        if df.empty:
+        res = cached_analysis(dept, year)
+        if not res["stats"]["total_students"]:
             return jsonify({"success": False, "message": "No students found"}), 400
 
-        res = analyze_subset(df)
         return jsonify({"success": True, **res})
     except Exception as e:
         return jsonify({"success": False, "message": f"Analysis failed: {str(e)}"}), 500
@@ -158,17 +209,13 @@ def api_year():
         if not year:
             return jsonify({"success": False, "message": "Year is required"}), 400
 
-        df = get_supabase_data()
-        
-        if df.empty:
+        if snapshot.frame().empty:
             return jsonify({"success": False, "message": "No data available"}), 400
-        
-        df = df[df["YEAR"].astype(str) == str(year)]
 
-        if df.empty:
+        res = cached_analysis(year=year)
+        if not res["stats"]["total_students"]:
             return jsonify({"success": False, "message": f"No students found for year {year}"}), 400
 
-        res = analyze_subset(df)
         return jsonify({"success": True, **res})
     except Exception as e:
         return jsonify({"success": False, "message": f"Analysis failed: {str(e)}"}), 500
@@ -176,12 +223,10 @@ def api_year():
 @app.route("/api/college/analyze")
 def api_college():
     try:
-        df = get_supabase_data()
-        
-        if df.empty:
+        if snapshot.frame().empty:
             return jsonify({"success": False, "message": "No data available"}), 400
-        
-        res = analyze_subset(df)
+
+        res = cached_analysis()
         return jsonify({"success": True, **res})
     except Exception as e:
         return jsonify({"success": False, "message": f"Analysis failed: {str(e)}"}), 500
@@ -195,147 +240,342 @@ def api_student_search():
         if not rno:
             return jsonify({"success": False, "message": "Please provide Register Number"}), 400
 
-        url = f"{SUPABASE_URL}/rest/v1/students?rno=eq.{rno}&select=*"
-        headers = {
-            'apikey': SUPABASE_KEY,
-            'Authorization': f'Bearer {SUPABASE_KEY}',
-            'Accept': 'application/json'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            if data:
-                student = data[0]
-                # Convert to proper format with correct data types
-                student_data = {
-                    "NAME": str(student.get("name", "")),
-                    "RNO": str(student.get("rno", "")),
-                    "EMAIL": str(student.get("email", "")),
-                    "DEPT": str(student.get("dept", "")),
-                    "YEAR": int(student.get("year", 1)),
-                    "CURR_SEM": int(student.get("curr_sem", 1)),
-                    "MENTOR": str(student.get("mentor") or ""),
-                    "MENTOR_EMAIL": str(student.get("mentor_email") or ""),
-                    "SEM1": float(student.get("sem1", 0)),
-                    "SEM2": float(student.get("sem2", 0)),
-                    "SEM3": float(student.get("sem3", 0)),
-                    "SEM4": float(student.get("sem4", 0)),
-                    "SEM5": float(student.get("sem5", 0)),
-                    "SEM6": float(student.get("sem6", 0)),
-                    "SEM7": float(student.get("sem7", 0)),
-                    "SEM8": float(student.get("sem8", 0)),
-                    "INTERNAL_MARKS": float(student.get("internal_marks", 20)),
-                    "TOTAL_DAYS_CURR": float(student.get("total_days_curr", 90)),
-                    "ATTENDED_DAYS_CURR": float(student.get("attended_days_curr", 80)),
-                    "PREV_ATTENDANCE_PERC": float(student.get("prev_attendance_perc", 85)),
-                    "BEHAVIOR_SCORE_10": float(student.get("behavior_score_10", 7)),
-                    "PERFORMANCE_OVERALL": float(student.get("performance_overall", 50)),
-                    "PERFORMANCE_LABEL": str(student.get("performance_label", "medium")),
-                    "RISK_SCORE": float(student.get("risk_score", 50)),
-                    "RISK_LABEL": str(student.get("risk_label", "medium")),
-                    "DROPOUT_SCORE": float(student.get("dropout_score", 50)),
-                    "DROPOUT_LABEL": str(student.get("dropout_label", "medium")),
-                    "ATTENDANCE_PCT": float(student.get("attendance_pct", 75)),
-                    "BEHAVIOR_PCT": float(student.get("behavior_pct", 70)),
-                    "INTERNAL_PCT": float(student.get("internal_pct", 66))
-                }
-                return jsonify({"success": True, "student": student_data})
+        # Pooled keep-alive connection shared with the worker's other request threads
+        student = db.fetch_student(rno)
+        if student:
+            # Convert to proper format with correct data types
+            student_data = {
+                "NAME": str(student.get("name", "")),
+                "RNO": str(student.get("rno", "")),
+                "EMAIL": str(student.get("email", "")),
+                "DEPT": str(student.get("dept", "")),
+                "YEAR": int(student.get("year", 1)),
+                "CURR_SEM": int(student.get("curr_sem", 1)),
+                "MENTOR": str(student.get("mentor") or ""),
+                "MENTOR_EMAIL": str(student.get("mentor_email") or ""),
+                "SEM1": float(student.get("sem1", 0)),
+                "SEM2": float(student.get("sem2", 0)),
+                "SEM3": float(student.get("sem3", 0)),
+                "SEM4": float(student.get("sem4", 0)),
+                "SEM5": float(student.get("sem5", 0)),
+                "SEM6": float(student.get("sem6", 0)),
+                "SEM7": float(student.get("sem7", 0)),
+                "SEM8": float(student.get("sem8", 0)),
+                "INTERNAL_MARKS": float(student.get("internal_marks", 20)),
+                "TOTAL_DAYS_CURR": float(student.get("total_days_curr", 90)),
+                "ATTENDED_DAYS_CURR": float(student.get("attended_days_curr", 80)),
+                "PREV_ATTENDANCE_PERC": float(student.get("prev_attendance_perc", 85)),
+                "BEHAVIOR_SCORE_10": float(student.get("behavior_score_10", 7)),
+                "PERFORMANCE_OVERALL": float(student.get("performance_overall", 50)),
+                "PERFORMANCE_LABEL": str(student.get("performance_label", "medium")),
+                "RISK_SCORE": float(student.get("risk_score", 50)),
+                "RISK_LABEL": str(student.get("risk_label", "medium")),
+                "DROPOUT_SCORE": float(student.get("dropout_score", 50)),
+                "DROPOUT_LABEL": str(student.get("dropout_label", "medium")),
+                "ATTENDANCE_PCT": float(student.get("attendance_pct", 75)),
+                "BEHAVIOR_PCT": float(student.get("behavior_pct", 70)),
+                "INTERNAL_PCT": float(student.get("internal_pct", 66))
+            }
+            return jsonify({"success": True, "student": student_data})
         
         return jsonify({"success": False, "message": "Student not found"}), 404
         
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+READ_LIMIT = 200
+
+def json_value(value):
+    """Plain Python value for jsonify: NaN/NA become None, NumPy scalars are unwrapped"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+def crud_student(row):
+    """Student fields for the CRUD endpoints, plus scores and labels under the lowercase keys app.js reads"""
+    student = {col: json_value(row.get(col)) for col in STUDENT_COLUMNS if col in row}
+    for name in SCORES + list(HEADS):
+        student[name] = json_value(row.get(name.upper()))
+    return student
+
+def stored_student(rno):
+    """Current row for an RNO read from the database, never this worker's possibly stale snapshot"""
+    row = db.fetch_student(rno)
+    return {k.upper(): v for k, v in row.items()} if row else None
+
+def request_body():
+    """JSON body with uppercase keys, matching the students table columns"""
+    data = request.get_json(silent=True) or {}
+    return {str(k).upper(): v for k, v in data.items()}
+
+def request_list(key):
+    """List of records or values from the JSON body; ValueError when missing"""
+    items = (request.get_json(silent=True) or {}).get(key)
+    if not isinstance(items, list) or not items:
+        raise ValueError(f"Please provide a list of {key}")
+    return items
+
+@app.route("/api/student/create", methods=["POST"])
+def api_student_create():
+    try:
+        data = request_body()
+        rno = str(data.get("RNO") or "").strip()
+        if not rno:
+            return jsonify({"success": False, "message": "Please provide Register Number"}), 400
+        if stored_student(rno) is not None:
+            return jsonify({"success": False, "message": f"Student {rno} already exists"}), 409
+
+        scored, errors = prepare_records([data], MODEL)
+        if errors:
+            return jsonify({"success": False, "message": errors[0]["error"]}), 400
+
+        if not db.insert_student(to_records(scored)[0]):
+            return jsonify({"success": False, "message": "Failed to save student"}), 500
+        snapshot.upsert(scored)
+
+        student = crud_student(scored.iloc[0].to_dict())
+        return jsonify({"success": True, "message": f"Student {rno} created", "student": student})
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route("/api/student/create/batch", methods=["POST"])
+def api_student_create_batch():
+    try:
+        students = request_list("students")
+        scored, errors = prepare_records(students, MODEL)
+        created = []
+
+        if scored is not None:
+            taken = scored["RNO"].isin(snapshot.frame().index) | scored["RNO"].duplicated()
+            errors += [{"row": int(row), "RNO": rno, "error": "already exists"}
+                       for row, rno in scored.loc[taken, "RNO"].items()]
+            scored = scored[~taken]
+
+        if scored is not None and not scored.empty:
+            ok = written_mask(len(scored), db.insert_students(to_records(scored)))
+            errors += [{"row": int(row), "RNO": rno, "error": "failed to save"}
+                       for row, rno in scored.loc[~ok, "RNO"].items()]
+            snapshot.upsert(scored[ok])
+            created = [crud_student(r) for r in scored[ok].to_dict("records")]
+
+        errors.sort(key=lambda e: e["row"])
+        return jsonify({"success": True, "created": len(created), "failed": len(errors),
+                        "students": created, "errors": errors[:MAX_REPORTED_ERRORS]})
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route("/api/student/read", methods=["POST"])
+def api_student_read():
+    try:
+        data = request.get_json(silent=True) or {}
+        rno = str(data.get("rno") or "").strip()
+        name = str(data.get("name") or "").strip()
+        if not rno and not name:
+            return jsonify({"success": False, "message": "Please provide Register Number or Name"}), 400
+
+        df = snapshot.frame()
+        if df.empty:
+            rows = pd.DataFrame()
+        else:
+            mask = pd.Series(True, index=df.index)
+            if rno:
+                mask &= df["RNO"].astype(str).str.upper() == rno.upper()
+            if name:
+                mask &= df["NAME"].astype(str).str.contains(name, case=False, regex=False, na=False)
+            rows = df[mask]
+
+        students = [crud_student(r) for r in rows.head(READ_LIMIT).to_dict("records")]
+        if not students and rno and not name:
+            # Written by another worker since our snapshot was loaded
+            row = db.get_student_by_rno(rno)
+            students = [crud_student(row)] if row else []
+        if not students:
+            return jsonify({"success": False, "message": "No students found"}), 404
+
+        return jsonify({"success": True, "count": max(len(rows), len(students)), "students": students})
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route("/api/student/read/batch", methods=["POST"])
+def api_student_read_batch():
+    try:
+        rnos = [str(r).strip() for r in request_list("rnos")]
+        df = snapshot.frame()
+        found = df.index.intersection(rnos) if not df.empty else pd.Index([])
+        students = [crud_student(r) for r in df.loc[found].to_dict("records")] if len(found) else []
+        missing = [r for r in rnos if r not in set(found)]
+        return jsonify({"success": True, "count": len(students), "students": students, "not_found": missing})
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route("/api/student/update", methods=["POST"])
+def api_student_update():
+    try:
+        data = request_body()
+        rno = str(data.get("RNO") or "").strip()
+        if not rno:
+            return jsonify({"success": False, "message": "Please provide Register Number"}), 400
+        current = stored_student(rno)
+        if current is None:
+            return jsonify({"success": False, "message": "Student not found"}), 404
+
+        # Rescore the full row so derived percentages and labels stay in step with the marks
+        scored, errors = prepare_records([{**current, **data, "RNO": rno}], MODEL)
+        if errors:
+            return jsonify({"success": False, "message": errors[0]["error"]}), 400
+
+        if not db.update_student(rno, to_records(scored)[0]):
+            return jsonify({"success": False, "message": "Failed to save student"}), 500
+        snapshot.upsert(scored)
+
+        student = crud_student(scored.iloc[0].to_dict())
+        return jsonify({"success": True, "message": f"Student {rno} updated", "student": student})
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route("/api/student/update/batch", methods=["POST"])
+def api_student_update_batch():
+    try:
+        students = request_list("students")
+        if not all(isinstance(s, dict) for s in students):
+            raise ValueError("Each student must be an object")
+        students = [{str(k).upper(): v for k, v in s.items()} for s in students]
+        # Merge into the rows as stored now, so an edit made through another worker is not overwritten
+        stored = db.fetch_students(rno for rno in (str(s.get("RNO") or "").strip() for s in students) if rno)
+        merged, rows, errors = [], [], []
+        for row, changes in enumerate(students, start=1):
+            rno = str(changes.get("RNO") or "").strip()
+            current = stored.get(rno) if rno else None
+            if current is None:
+                errors.append({"row": row, "RNO": rno or None, "error": "not found"})
+                continue
+            merged.append({**{k.upper(): v for k, v in current.items()}, **changes, "RNO": rno})
+            rows.append(row)
+
+        updated = []
+        scored, invalid = prepare_records(merged, MODEL) if merged else (None, [])
+        errors += [dict(e, row=rows[e["row"] - 1]) for e in invalid]
+
+        if scored is not None:
+            ok = written_mask(len(scored), db.upsert_students(to_records(scored)))
+            errors += [{"row": rows[pos - 1], "RNO": rno, "error": "failed to save"}
+                       for pos, rno in scored.loc[~ok, "RNO"].items()]
+            snapshot.upsert(scored[ok])
+            updated = [crud_student(r) for r in scored[ok].to_dict("records")]
+
+        errors.sort(key=lambda e: e["row"])
+        return jsonify({"success": True, "updated": len(updated), "failed": len(errors),
+                        "students": updated, "errors": errors[:MAX_REPORTED_ERRORS]})
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route("/api/student/delete", methods=["POST"])
+def api_student_delete():
+    try:
+        data = request.get_json(silent=True) or {}
+        rno = str(data.get("rno") or data.get("RNO") or "").strip()
+        if not rno:
+            return jsonify({"success": False, "message": "Please provide Register Number"}), 400
+        current = stored_student(rno)
+        if current is None:
+            return jsonify({"success": False, "message": "Student not found"}), 404
+
+        if not db.delete_student(rno):
+            return jsonify({"success": False, "message": "Failed to delete student"}), 500
+        snapshot.remove([rno])
+
+        return jsonify({"success": True, "message": f"Student {rno} deleted", "deleted_student": crud_student(current)})
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route("/api/student/delete/batch", methods=["POST"])
+def api_student_delete_batch():
+    try:
+        rnos = list(dict.fromkeys(str(r).strip() for r in request_list("rnos")))
+        failed = set(db.delete_students(rnos))
+        deleted = [r for r in rnos if r not in failed]
+        snapshot.remove(deleted)
+        return jsonify({"success": True, "deleted": len(deleted), "deleted_rnos": deleted, "failed": sorted(failed)})
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+def wants_explanation(body=None):
+    """True when the caller asked for per-feature contributions (?explain=1 or "explain": true)"""
+    flag = request.args.get("explain", "")
+    if body and "explain" in body:
+        flag = body.get("explain")
+    return str(flag).lower() in ("1", "true", "yes")
+
 @app.route("/api/student/predict", methods=["POST"])
 def api_student_predict():
     try:
         student = request.get_json(silent=True) or {}
         rno = student.get("RNO", "").strip()
+        explain = wants_explanation()
         
         # If RNO exists, fetch from Supabase database
         if rno:
-            url = f"{SUPABASE_URL}/rest/v1/students?rno=eq.{rno}&select=*"
-            headers = {
-                'apikey': SUPABASE_KEY,
-                'Authorization': f'Bearer {SUPABASE_KEY}',
-                'Accept': 'application/json'
-            }
-            
-            response = requests.get(url, headers=headers, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data:
-                    db_student = data[0]
-                    
-                    # Use exact data from database
-                    features = {
-                        "performance_overall": float(db_student.get("performance_overall", 50)),
-                        "risk_score": float(db_student.get("risk_score", 50)),
-                        "dropout_score": float(db_student.get("dropout_score", 50)),
-                        "attendance_pct": float(db_student.get("attendance_pct", 75)),
-                        "behavior_pct": float(db_student.get("behavior_pct", 70)),
-                        "internal_pct": float(db_student.get("internal_pct", 66)),
-                        "present_att": (float(db_student.get("attended_days_curr", 80)) / float(db_student.get("total_days_curr", 90))) * 100,
-                        "prev_att": float(db_student.get("prev_attendance_perc", 85)),
-                        "past_avg": float(db_student.get("sem1", 0)) if float(db_student.get("sem1", 0)) > 0 else 70
-                    }
-                    
-                    # Use exact predictions from database
-                    predictions = {
-                        "performance_label": str(db_student.get("performance_label", "medium")).lower(),
-                        "risk_label": str(db_student.get("risk_label", "medium")).lower(),
-                        "dropout_label": str(db_student.get("dropout_label", "medium")).lower()
-                    }
-                    
-                    # Alert check
-                    need_alert = (predictions["performance_label"] in ["poor", "low"] or 
-                                 predictions["risk_label"] == "high" or 
-                                 predictions["dropout_label"] == "high")
-                    
-                    return jsonify({
-                        "success": True,
-                        "student": student,
-                        "features": features,
-                        "predictions": predictions,
-                        "need_alert": need_alert
-                    })
-        
-        # Fallback for new students - calculate from input
-        behavior_score = float(student.get("BEHAVIOR_SCORE_10", 5))
-        internal_marks = float(student.get("INTERNAL_MARKS", 15))
-        attended_days = float(student.get("ATTENDED_DAYS_CURR", 45))
-        total_days = float(student.get("TOTAL_DAYS_CURR", 90))
+            db_student = db.fetch_student(rno)
+            if db_student:
+                # Use exact data from database
+                features = {
+                    "performance_overall": float(db_student.get("performance_overall", 50)),
+                    "risk_score": float(db_student.get("risk_score", 50)),
+                    "dropout_score": float(db_student.get("dropout_score", 50)),
+                    "attendance_pct": float(db_student.get("attendance_pct", 75)),
+                    "behavior_pct": float(db_student.get("behavior_pct", 70)),
+                    "internal_pct": float(db_student.get("internal_pct", 66)),
+                    "present_att": (float(db_student.get("attended_days_curr", 80)) / float(db_student.get("total_days_curr", 90))) * 100,
+                    "prev_att": float(db_student.get("prev_attendance_perc", 85)),
+                    "past_avg": float(db_student.get("sem1", 0)) if float(db_student.get("sem1", 0)) > 0 else 70
+                }
+                
+                # Use exact predictions from database
+                predictions = {
+                    "performance_label": str(db_student.get("performance_label", "medium")).lower(),
+                    "risk_label": str(db_student.get("risk_label", "medium")).lower(),
+                    "dropout_label": str(db_student.get("dropout_label", "medium")).lower()
+                }
+                
+                # Alert check
+                alert = bool(need_alert(predictions["performance_label"],
+                                        predictions["risk_label"],
+                                        predictions["dropout_label"]))
+                
+                result = {
+                    "success": True,
+                    "student": student,
+                    "features": features,
+                    "predictions": predictions,
+                    "need_alert": alert
+                }
+                if explain:
+                    # The contributions break down the model's score for the stored columns, which
+                    # can differ from the stored scores above; return those model scores with them
+                    X = student_features({k.upper(): v for k, v in db_student.items()})
+                    scored = MODEL.predict(X)
+                    result["model_scores"] = {name: round(float(scored[name][0]), 2) for name in SCORES}
+                    result["contributions"] = MODEL.explain(X)[0]
+                return jsonify(result)
+        
+        # Fallback for new students - score the input with the loaded model
         prev_att = float(student.get("PREV_ATTENDANCE_PERC", 75))
-        
-        behavior_pct = (behavior_score / 10.0) * 100
-        internal_pct = (internal_marks / 30.0) * 100
-        present_att = (attended_days / total_days) * 100 if total_days > 0 else 0
-        
-        perf_overall = (internal_pct * 0.4 + present_att * 0.4 + behavior_pct * 0.2)
-        risk_score = 100 - perf_overall
-        dropout_score = risk_score
-        
-        def get_performance_label(score):
-            if score >= 75: return "high"
-            elif score >= 50: return "medium"
-            elif score >= 25: return "low"
-            else: return "poor"
-        
-        def get_risk_label(score):
-            if score >= 70: return "high"
-            elif score >= 40: return "medium"
-            else: return "low"
-        
-        sems = [float(student.get(f"SEM{i}", 0)) for i in range(1, 9)]
-        past_avg = sum(s for s in sems if s > 0) / len([s for s in sems if s > 0]) if any(s > 0 for s in sems) else 0
+        X = student_features(student)
+        result = MODEL.predict(X)
+        past_avg, internal_pct, present_att, behavior_pct = (float(v) for v in X[0])
         
         features = {
-            "performance_overall": round(perf_overall, 1),
-            "risk_score": round(risk_score, 1),
-            "dropout_score": round(dropout_score, 1),
+            "performance_overall": round(float(result["performance_overall"][0]), 1),
+            "risk_score": round(float(result["risk_score"][0]), 1),
+            "dropout_score": round(float(result["dropout_score"][0]), 1),
             "attendance_pct": round(present_att, 1),
             "behavior_pct": round(behavior_pct, 1),
             "internal_pct": round(internal_pct, 1),
@@ -345,26 +585,242 @@ def api_student_predict():
         }
         
         predictions = {
-            "performance_label": get_performance_label(perf_overall),
-            "risk_label": get_risk_label(risk_score),
-            "dropout_label": get_risk_label(dropout_score)
+            "performance_label": str(result["performance_label"][0]),
+            "risk_label": str(result["risk_label"][0]),
+            "dropout_label": str(result["dropout_label"][0])
         }
         
-        need_alert = (predictions["performance_label"] in ["poor", "low"] or 
-                     predictions["risk_label"] == "high" or 
-                     predictions["dropout_label"] == "high")
+        alert = bool(need_alert(predictions["performance_label"],
+                                predictions["risk_label"],
+                                predictions["dropout_label"]))
         
-        return jsonify({
+        response = {
             "success": True,
             "student": student,
             "features": features,
             "predictions": predictions,
-            "need_alert": need_alert
-        })
+            "need_alert": alert
+        }
+        if explain:
+            response["contributions"] = MODEL.explain(X)[0]
+        return jsonify(response)
         
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+@app.route("/api/student/predict/batch", methods=["POST"])
+def api_student_predict_batch():
+    try:
+        data = request.get_json(silent=True) or {}
+        students = data.get("students") or []
+        explain = wants_explanation(data)
+
+        if not isinstance(students, list) or not students:
+            return jsonify({"success": False, "message": "Please provide a list of students"}), 400
+        if not all(isinstance(s, dict) for s in students):
+            return jsonify({"success": False, "message": "Each student must be an object"}), 400
+
+        df = pd.DataFrame(students)
+        df.columns = df.columns.str.upper()
+        scored = MODEL.predict_frame(df)
+        alerts = need_alert(scored["performance_label"].to_numpy(),
+                            scored["risk_label"].to_numpy(),
+                            scored["dropout_label"].to_numpy())
+
+        rounded = scored[FEATURES + SCORES].round(1)
+        contributions = MODEL.explain(scored[FEATURES].to_numpy()) if explain else None
+        results = []
+        for i, record in enumerate(rounded.to_dict("records")):
+            results.append({
+                "RNO": str(students[i].get("RNO", "")),
+                "features": {name: record[name] for name in FEATURES},
+                "scores": {name: record[name] for name in SCORES},
+                "predictions": {head: str(scored[head].iat[i]) for head in HEADS},
+                "need_alert": bool(alerts[i])
+            })
+            if explain:
+                results[-1]["contributions"] = contributions[i]
+
+        return jsonify({"success": True, "count": len(results), "results": results})
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route("/api/student/whatif", methods=["POST"])
+def api_student_whatif():
+    try:
+        data = request.get_json(silent=True) or {}
+        rno = str(data.get("rno", "")).strip()
+
+        if not rno:
+            return jsonify({"success": False, "message": "Please provide Register Number"}), 400
+
+        student = db.fetch_student(rno)
+        if not student:
+            return jsonify({"success": False, "message": "Student not found"}), 404
+
+        student = {k.upper(): v for k, v in student.items()}
+        result = whatif_grid(MODEL, student, data.get("ranges"))
+        return jsonify({"success": True, "rno": rno, **result})
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Simulation failed: {str(e)}"}), 500
+
+@app.route("/api/cohort/simulate", methods=["POST"])
+def api_cohort_simulate():
+    try:
+        data = request.get_json(silent=True) or {}
+        adjustments = data.get("adjustments") or {}
+
+        if not isinstance(adjustments, dict) or not adjustments:
+            return jsonify({"success": False, "message": "Please provide adjustments"}), 400
+
+        df = snapshot.slice(data.get("dept"), data.get("year"))
+        if df.empty:
+            return jsonify({"success": False, "message": "No students found"}), 400
+
+        res = cohort_intervention(MODEL, df, adjustments)
+        return jsonify({"success": True, "dept": data.get("dept"), "year": data.get("year"), **res})
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Simulation failed: {str(e)}"}), 500
+
+def upload_message(report):
+    """Summary line shown by the batch upload UI"""
+    if report["mode"] == "normalize":
+        message = f"Added {report['added']} new students, updated {report['updated']} existing students"
+        if report.get("resumed_from_chunk"):
+            message = f"Resumed from chunk {report['resumed_from_chunk']}. " + message
+    else:
+        message = f"Processed {report['processed_rows']} records"
+    if report["unchanged"]:
+        message += f" ({report['unchanged']} unchanged rows skipped)"
+    if report["duplicates"] or report["conflicts"]:
+        message += (f" ({report['duplicates']} duplicate and {report['conflicts']} conflicting"
+                    f" repeats of an RNO skipped)")
+    if report["invalid_rows"]:
+        message += f" ({report['invalid_rows']} invalid rows skipped)"
+    if report["failed"]:
+        message += f" ({report['failed']} rows failed to save)"
+    if report.get("status") == "failed":
+        message += f". Import stopped at chunk {report['failed_chunk']}; upload the same file again to resume"
+    return message
+
+def import_job(path, filename, mode, checkpoint=None, resume=None):
+    """Build the background job that streams a saved upload through the ingest pipeline"""
+    def run(progress):
+        def report_progress(report):
+            progress(report["processed_rows"], report["invalid_rows"] + report["failed"])
+
+        try:
+            with open(path, "rb") as f:
+                stored = snapshot.frame() if mode == "normalize" else None
+                existing = stored.index if stored is not None else ()
+                report = run_pipeline(read_upload_chunks(f, filename), MODEL, mode=mode, existing=existing,
+                                      checkpoint=checkpoint, resume=resume, progress=report_progress,
+                                      stored=stored)
+        finally:
+            os.remove(path)
+
+        if mode == "normalize" and (report["added"] or report["updated"]):
+            snapshot.invalidate()
+        return upload_message(report), report
+    return run
+
+@app.route("/api/batch-upload", methods=["POST"])
+def api_batch_upload():
+    try:
+        upload = request.files.get("file")
+        mode = request.form.get("mode", "normalize")
+
+        if not upload or not upload.filename:
+            return jsonify({"success": False, "message": "Please upload a file"}), 400
+        if mode not in ("normalize", "analytics"):
+            return jsonify({"success": False, "message": f"Unknown mode '{mode}'"}), 400
+        ext = os.path.splitext(upload.filename)[1].lower()
+        if ext not in SUPPORTED_EXTENSIONS:
+            return jsonify({"success": False, "message": "Only .csv and .xlsx files are supported"}), 400
+
+        # The request stream closes with the response, so the job works from a copy on disk
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4().hex}{ext}")
+        upload.save(path)
+
+        checkpoint = resume = None
+        if mode == "normalize":
+            # Imports are tracked by content hash so a re-sent file resumes after its last written chunk
+            store = ImportCheckpoints()
+            with open(path, "rb") as f:
+                content_hash = file_hash(f)
+            restart = request.form.get("restart", "").lower() in ("1", "true", "yes")
+            resume = store.start(content_hash, upload.filename, CHUNK_SIZE, restart)
+            if resume and resume.get("in_progress"):
+                os.remove(path)
+                return jsonify({"success": False, "message": "This file is already being imported",
+                                "last_chunk": resume["last_chunk"]}), 409
+            if resume and resume["status"] == "completed":
+                os.remove(path)
+                report = dict(resume["report"], status="completed", already_imported=True)
+                return jsonify({"success": True, "message": "This file has already been imported", **report})
+            checkpoint = (store, content_hash)
+
+        total_rows = estimate_rows(path)
+        job_id = jobs.submit("batch-upload", f"{mode}: {upload.filename}",
+                             import_job(path, upload.filename, mode, checkpoint, resume), total_rows)
+
+        return jsonify({
+            "success": True,
+            "job_id": job_id,
+            "status": "queued",
+            "total_rows": total_rows,
+            "message": f"Upload queued for processing ({total_rows or 'unknown'} rows)"
+        }), 202
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Upload failed: {str(e)}"}), 500
+
+@app.route("/api/jobs/<job_id>")
+def api_job_status(job_id):
+    try:
+        job = jobs.get(job_id)
+        if not job:
+            return jsonify({"success": False, "message": "Job not found"}), 404
+        return jsonify({"success": True, "job": job})
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+def parse_timestamp(value):
+    """Accept epoch seconds or an ISO-8601 string; returns epoch seconds"""
+    if value in (None, ""):
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+@app.route("/api/alerts/at-risk")
+def api_alerts_at_risk():
+    try:
+        since = parse_timestamp(request.args.get("since"))
+        students = scanner.newly_at_risk(since)
+        for s in students:
+            s["flagged_at"] = datetime.fromtimestamp(s["flagged_at"], timezone.utc).isoformat()
+
+        return jsonify({
+            "success": True,
+            "since": datetime.fromtimestamp(since, timezone.utc).isoformat(),
+            "scanned_at": datetime.fromtimestamp(scanner.last_run, timezone.utc).isoformat(),
+            "count": len(students),
+            "students": students
+        })
+    except ValueError:
+        return jsonify({"success": False, "message": "Invalid 'since' timestamp"}), 400
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
 @app.route("/api/send-alert", methods=["POST"])
 def send_alert():
     try:
@@ -379,146 +835,106 @@ def send_alert():
         if not mentor_email:
             return jsonify({"success": False, "message": "Mentor email is required"}), 400
         
-        # Email configuration
-        smtp_server = "smtp.gmail.com"
-        smtp_port = 587
-        sender_email = os.getenv('EMAIL_USER')
-        sender_password = os.getenv('EMAIL_PASSWORD')
-        
-        if not sender_email or not sender_password:
+        if not smtp_pool.configured():
             return jsonify({"success": False, "message": "Email configuration missing"}), 500
         
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['From'] = sender_email
-        msg['To'] = mentor_email
-        msg['Subject'] = f"🚨 EduMetric Alert: {student_name} ({student_rno}) - Immediate Attention Required"
-        
-        # HTML email body with professional styling
-        html_body = f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="utf-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Student Alert</title>
-</head>
-<body style="margin: 0; padding: 0; font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background-color: #f5f5f5;">
-    <div style="max-width: 600px; margin: 0 auto; background-color: #ffffff; box-shadow: 0 4px 12px rgba(0,0,0,0.1);">
-        <!-- Header -->
-        <div style="background: linear-gradient(135deg, #1976d2, #42a5f5); color: white; padding: 30px 20px; text-align: center;">
-            <h1 style="margin: 0; font-size: 28px; font-weight: 600;">🚨 STUDENT ALERT</h1>
-            <p style="margin: 10px 0 0 0; font-size: 16px; opacity: 0.9;">EduMetric - Intelligent Student Performance Analytics</p>
-        </div>
-        
-        <!-- Alert Banner -->
-        <div style="background-color: #fff3cd; border-left: 5px solid #ffc107; padding: 15px 20px; margin: 0;">
-            <h2 style="margin: 0; color: #856404; font-size: 18px;">⚠️ IMMEDIATE ATTENTION REQUIRED</h2>
-        </div>
-        
-        <!-- Student Information -->
-        <div style="padding: 30px 20px;">
-            <h3 style="color: #1976d2; margin: 0 0 20px 0; font-size: 20px; border-bottom: 2px solid #e3f2fd; padding-bottom: 10px;">👨‍🎓 Student Details</h3>
-            
-            <table style="width: 100%; border-collapse: collapse; margin-bottom: 25px;">
-                <tr>
-                    <td style="padding: 12px 0; border-bottom: 1px solid #e0e0e0; font-weight: 600; color: #424242; width: 40%;">📝 Student Name:</td>
-                    <td style="padding: 12px 0; border-bottom: 1px solid #e0e0e0; color: #1976d2; font-weight: 600;">{student_name}</td>
-                </tr>
-                <tr>
-                    <td style="padding: 12px 0; border-bottom: 1px solid #e0e0e0; font-weight: 600; color: #424242;">🆔 Register Number:</td>
-                    <td style="padding: 12px 0; border-bottom: 1px solid #e0e0e0; color: #1976d2; font-weight: 600;">{student_rno}</td>
-                </tr>
-                <tr>
-                    <td style="padding: 12px 0; border-bottom: 1px solid #e0e0e0; font-weight: 600; color: #424242;">📊 Performance Level:</td>
-                    <td style="padding: 12px 0; border-bottom: 1px solid #e0e0e0;"><span style="background-color: #ffebee; color: #c62828; padding: 6px 12px; border-radius: 20px; font-weight: 600; text-transform: uppercase;">{performance.upper()}</span></td>
-                </tr>
-                <tr>
-                    <td style="padding: 12px 0; border-bottom: 1px solid #e0e0e0; font-weight: 600; color: #424242;">⚠️ Risk Level:</td>
-                    <td style="padding: 12px 0; border-bottom: 1px solid #e0e0e0;"><span style="background-color: #fff3e0; color: #ef6c00; padding: 6px 12px; border-radius: 20px; font-weight: 600; text-transform: uppercase;">{risk.upper()}</span></td>
-                </tr>
-                <tr>
-                    <td style="padding: 12px 0; font-weight: 600; color: #424242;">🚪 Dropout Risk:</td>
-                    <td style="padding: 12px 0;"><span style="background-color: #fce4ec; color: #ad1457; padding: 6px 12px; border-radius: 20px; font-weight: 600; text-transform: uppercase;">{dropout.upper()}</span></td>
-                </tr>
-            </table>
-            
-            <!-- Action Items -->
-            <h3 style="color: #1976d2; margin: 30px 0 20px 0; font-size: 20px; border-bottom: 2px solid #e3f2fd; padding-bottom: 10px;">🎯 Recommended Actions</h3>
-            
-            <div style="background-color: #f8f9fa; border-radius: 8px; padding: 20px; margin-bottom: 25px;">
-                <ul style="margin: 0; padding-left: 20px; line-height: 1.8;">
-                    <li style="margin-bottom: 10px; color: #424242;"><strong>📅 Schedule an immediate one-on-one meeting</strong> within 24 hours</li>
-                    <li style="margin-bottom: 10px; color: #424242;"><strong>📋 Review academic performance and attendance</strong> patterns</li>
-                    <li style="margin-bottom: 10px; color: #424242;"><strong>🎓 Provide additional academic support</strong> and resources</li>
-                    <li style="margin-bottom: 10px; color: #424242;"><strong>👥 Contact parents/guardians</strong> if necessary</li>
-                    <li style="color: #424242;"><strong>📈 Monitor progress closely</strong> with weekly check-ins</li>
-                </ul>
-            </div>
-            
-            <!-- Urgency Notice -->
-            <div style="background: linear-gradient(135deg, #f44336, #ef5350); color: white; padding: 20px; border-radius: 8px; text-align: center; margin-bottom: 25px;">
-                <h4 style="margin: 0 0 10px 0; font-size: 18px;">⏰ TIME SENSITIVE</h4>
-                <p style="margin: 0; font-size: 16px;">Please take appropriate action as soon as possible to support this student's academic success.</p>
-            </div>
-        </div>
-        
-        <!-- Footer -->
-        <div style="background-color: #263238; color: white; padding: 25px 20px; text-align: center;">
-            <p style="margin: 0 0 10px 0; font-size: 16px; font-weight: 600;">EduMetric System</p>
-            <p style="margin: 0; font-size: 14px; opacity: 0.8;">Intelligent Student Performance Analytics Using Machine Learning</p>
-            <p style="margin: 15px 0 0 0; font-size: 12px; opacity: 0.6;">This is an automated alert. Please do not reply to this email.</p>
-        </div>
-    </div>
-</body>
-</html>
-        """
-        
-        # Plain text version for compatibility
-        text_body = f"""
-STUDENT ALERT - IMMEDIATE ATTENTION REQUIRED
-
-Dear Mentor,
-
-This is an automated alert from EduMetric regarding one of your mentees who requires immediate attention.
-
-STUDENT DETAILS:
-• Name: {student_name}
-• Register Number: {student_rno}
-• Performance Level: {performance.upper()}
-• Risk Level: {risk.upper()}
-• Dropout Risk: {dropout.upper()}
-
-RECOMMENDED ACTIONS:
-• Schedule an immediate one-on-one meeting within 24 hours
-• Review academic performance and attendance patterns
-• Provide additional academic support and resources
-• Contact parents/guardians if necessary
-• Monitor progress closely with weekly check-ins
-
-Please take appropriate action as soon as possible to support this student's academic success.
-
-Best regards,
-EduMetric System
-Intelligent Student Performance Analytics Using Machine Learning
-        """
-        
-        # Attach both versions
-        msg.attach(MIMEText(text_body, 'plain'))
-        msg.attach(MIMEText(html_body, 'html'))
-        
-        # Send email
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(sender_email, sender_password)
-        server.send_message(msg)
-        server.quit()
-        
-        return jsonify({"success": True, "message": "Alert sent successfully"})
+        _, suppressed, _ = throttle.admit(mentor_email, [(student_rno, (performance, risk, dropout))])
+        if suppressed == "duplicate":
+            hours = round(throttle.cooldown / 3600, 1)
+            return jsonify({"success": False, "suppressed": suppressed,
+                            "message": f"The same alert for {student_rno} was already sent to {mentor_email} "
+                                       f"in the last {hours:g} hours"}), 409
+        if suppressed == "rate_limited":
+            return jsonify({"success": False, "suppressed": suppressed,
+                            "message": f"{mentor_email} has reached the limit of {throttle.hourly_cap} "
+                                       f"alerts per hour"}), 429
+
+        keys = [alert_key(student_rno, mentor_email, (performance, risk, dropout))]
+        try:
+            msg = build_alert_message(smtp_pool.user, mentor_email, student_name, student_rno,
+                                      performance, risk, dropout)
+            # Delivery happens on the outbox workers; the request only records the message
+            alert_id = outbox.enqueue(msg, kind="alert", meta={
+                "rno": student_rno, "mentor_email": mentor_email, "throttle_keys": keys})
+        except Exception:
+            # Nothing was queued, so the alert must not count as sent when the user retries
+            throttle.release(keys)
+            raise
+        
+        return jsonify({"success": True, "message": "Alert queued for delivery", "alert_id": alert_id,
+                        "status": "queued"}), 202
         
     except Exception as e:
-        return jsonify({"success": False, "message": f"Failed to send alert: {str(e)}"}), 500
+        return jsonify({"success": False, "message": f"Failed to queue alert: {str(e)}"}), 500
+
+@app.route("/api/alerts/digest", methods=["POST"])
+def api_alerts_digest():
+    try:
+        data = request.get_json(silent=True) or {}
+        dept, year = data.get("dept"), data.get("year")
+
+        if not smtp_pool.configured():
+            return jsonify({"success": False, "message": "Email configuration missing"}), 500
+
+        flagged = flagged_students(snapshot.slice(dept, year))
+        # One digest per mentor instead of one email per student
+        queued, suppressed, unassigned = queue_digests(flagged, smtp_pool.user, outbox, throttle)
+
+        return jsonify({
+            "success": True,
+            "dept": dept,
+            "year": year,
+            "students_flagged": len(flagged),
+            "emails_queued": len(queued),
+            "suppressed": suppressed,
+            "no_mentor_email": unassigned,
+            "digests": queued
+        }), 202
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Failed to queue digests: {str(e)}"}), 500
+
+@app.route("/api/alerts/stats")
+def api_alert_stats():
+    try:
+        return jsonify({"success": True, "outbox": outbox.counts(), "throttle": throttle.stats(),
+                        "nightly_sweeps": nightly_sweep.last_runs()})
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route("/api/alerts/<alert_id>")
+def api_alert_status(alert_id):
+    try:
+        alert = outbox.get(alert_id)
+        if not alert:
+            return jsonify({"success": False, "message": "Alert not found"}), 404
+        return jsonify({"success": True, "alert": alert})
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+def start_background_services():
+    """Start the background workers that keep derived state current"""
+    # Without a preloading master (python app.py), or if its warmup failed, warm up here,
+    # retrying every WARMUP_RETRY_SECONDS; /readyz stays 503 until it succeeds
+    if not readiness["ready"]:
+        threading.Thread(target=warmup_until_ready, name="warmup", daemon=True).start()
+    if os.getenv('SCANNER_ENABLED', 'True').lower() == 'true':
+        scanner.start()
+    # Drains anything left queued by a previous run
+    outbox.start()
+    if os.getenv('NIGHTLY_SWEEP_ENABLED', 'True').lower() == 'true':
+        nightly_sweep.start()
+
+def stop_background_services(timeout=0):
+    """Stop the background workers; running import jobs stop at their next chunk within `timeout` seconds"""
+    scanner.stop()
+    nightly_sweep.stop()
+    outbox.stop()
+    jobs.drain(timeout)
 
 if __name__ == "__main__":
+    # Development server; production runs gunicorn with gunicorn.conf.py (see Procfile)
     port = int(os.environ.get("PORT", 5000))
-    app.run(host="0.0.0.0", port=port, debug=True)
\ No newline at end of file
+    # With the debug reloader, only the child process that serves requests runs workers
+    if not DEBUG or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_services()
+    app.run(host="0.0.0.0", port=port, debug=DEBUG)
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""Offline benchmark of the mentor alert path against the bundled SMTP sink.
+
+    python bench_alerts.py --alerts 500 --students 300 --mentors 20 --delay-ms 5
+
+Reports messages/sec and p50/p99 latency for raw SMTP sends (one connection per
+message vs. the shared pool), for /api/send-alert through the outbox, and for the
+per-mentor digest sweep. Nothing leaves the machine: mail goes to an in-process sink
+and all SQLite state lives in a scratch directory.
+"""
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from smtp_sink import SMTPSink
+
+
+def summarize(name, latencies, messages, elapsed):
+    rate = messages / elapsed if elapsed > 0 else 0.0
+    if len(latencies):
+        p50, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 99])
+        spread = f"{p50:>9.2f} {p99:>9.2f}"
+    else:
+        spread = f"{'-':>9} {'-':>9}"
+    print(f"{name:<28} {messages:>7} {elapsed:>9.2f} {rate:>10.1f} {spread}")
+
+
+def wait_for_outbox(outbox, timeout=300):
+    """Block until the outbox has nothing left to deliver"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        counts = outbox.counts()
+        if not any(counts.get(s) for s in ("queued", "retry", "sending")):
+            return counts
+        time.sleep(0.02)
+    raise TimeoutError(f"outbox not drained after {timeout}s: {outbox.counts()}")
+
+
+def synthetic_students(n, mentors, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "RNO": [f"BENCH{i:05d}" for i in range(n)],
+        "NAME": [f"Student {i}" for i in range(n)],
+        "DEPT": "CSE",
+        "YEAR": rng.integers(1, 5, n),
+        "MENTOR": [f"Mentor {i % mentors}" for i in range(n)],
+        "MENTOR_EMAIL": [f"mentor{i % mentors}@bench.local" for i in range(n)],
+        # Every student meets the alert rule so the sweep covers all of them
+        "PERFORMANCE_LABEL": rng.choice(["low", "poor"], n),
+        "RISK_LABEL": rng.choice(["low", "medium", "high"], n),
+        "DROPOUT_LABEL": rng.choice(["low", "medium", "high"], n),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark alert delivery against a local SMTP sink")
+    parser.add_argument("--alerts", type=int, default=300, help="single-student alerts per scenario")
+    parser.add_argument("--students", type=int, default=300, help="students in the digest sweep")
+    parser.add_argument("--mentors", type=int, default=20)
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="per-message delay added by the sink")
+    args = parser.parse_args()
+
+    sink = SMTPSink(delay=args.delay_ms / 1000).start()
+    host, port = sink.address
+    scratch = tempfile.mkdtemp(prefix="edumetric-bench-")
+    os.environ.update({
+        "SMTP_HOST": host, "SMTP_PORT": str(port), "SMTP_STARTTLS": "False",
+        "EMAIL_USER": "bench@edumetric.local", "EMAIL_PASSWORD": "bench",
+        "OUTBOX_DB": os.path.join(scratch, "outbox.db"), "JOBS_DB": os.path.join(scratch, "jobs.db"),
+        "IMPORT_CHECKPOINT_DB": os.path.join(scratch, "imports.db"), "SWEEP_DB": os.path.join(scratch, "sweeps.db"),
+        "SCANNER_DB": os.path.join(scratch, "scanner.db"), "ALERT_THROTTLE_DB": "",
+        "ALERT_MENTOR_HOURLY_CAP": str(10 ** 9), "OUTBOX_POLL_SECONDS": "0.05", "SCANNER_ENABLED": "False",
+    })
+
+    # Imported only now so every module reads the sink and scratch settings above
+    import smtplib
+    import app
+    from alerts import build_alert_message
+    from mailer import smtp_pool
+    from outbox import outbox
+
+    messages = [build_alert_message(smtp_pool.user, f"mentor{i % args.mentors}@bench.local", f"Student {i}",
+                                    f"RAW{i:05d}", "low", "high", "medium") for i in range(args.alerts)]
+    print(f"{'scenario':<28} {'msgs':>7} {'seconds':>9} {'msgs/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+
+    # 1. Baseline: connect, log in, send and quit per message, as send_alert() used to
+    latencies, start = [], time.perf_counter()
+    for msg in messages:
+        t = time.perf_counter()
+        server = smtplib.SMTP(host, port)
+        server.login(smtp_pool.user, smtp_pool.password)
+        server.send_message(msg)
+        server.quit()
+        latencies.append(time.perf_counter() - t)
+    summarize("smtp, connection per msg", latencies, len(messages), time.perf_counter() - start)
+
+    # 2. The shared pool: warm authenticated connections
+    latencies, start = [], time.perf_counter()
+    for msg in messages:
+        t = time.perf_counter()
+        smtp_pool.send(msg)
+        latencies.append(time.perf_counter() - t)
+    summarize("smtp, pooled", latencies, len(messages), time.perf_counter() - start)
+
+    # 3. /api/send-alert: request latency is the enqueue; throughput runs until the outbox drains
+    client = app.app.test_client()
+    received = sink.count
+    latencies, start = [], time.perf_counter()
+    for i in range(args.alerts):
+        t = time.perf_counter()
+        response = client.post("/api/send-alert", json={
+            "mentor_email": f"mentor{i % args.mentors}@bench.local", "student_name": f"Student {i}",
+            "student_rno": f"API{i:05d}", "performance": "low", "risk": "high", "dropout": "medium"})
+        latencies.append(time.perf_counter() - t)
+        if response.status_code != 202:
+            raise SystemExit(f"send-alert returned {response.status_code}: {response.get_json()}")
+    summarize("send-alert, request", latencies, args.alerts, time.perf_counter() - start)
+    wait_for_outbox(outbox)
+    summarize("send-alert, delivered", [], sink.count - received, time.perf_counter() - start)
+
+    # 4. Digest sweep: one email per mentor for every flagged student in scope
+    students = synthetic_students(args.students, args.mentors)
+    app.snapshot.loader = lambda: students
+    app.snapshot.invalidate()
+    received = sink.count
+    start = time.perf_counter()
+    response = client.post("/api/alerts/digest", json={"dept": "CSE"})
+    request_time = time.perf_counter() - start
+    body = response.get_json()
+    if response.status_code != 202:
+        raise SystemExit(f"digest returned {response.status_code}: {body}")
+    wait_for_outbox(outbox)
+    elapsed = time.perf_counter() - start
+    summarize("digest, request", [request_time], body["emails_queued"], request_time)
+    summarize("digest, delivered", [], sink.count - received, elapsed)
+    print(f"\ndigest sweep: {body['students_flagged']} flagged students -> {body['emails_queued']} emails; "
+          f"sink saw {sink.connections} SMTP connections in total")
+
+    outbox.stop()
+    smtp_pool.close()
+    sink.stop()
+
+
+if __name__ == "__main__":
+    main()
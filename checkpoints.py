@@ -0,0 +1,105 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+
+CHECKPOINT_DB = os.getenv('IMPORT_CHECKPOINT_DB',
+                          os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'imports.db'))
+# A 'running' import with no checkpoint for this long is taken to be dead and may be resumed
+IMPORT_STALE_SECONDS = int(os.getenv('IMPORT_STALE_SECONDS', 300))
+
+
+def file_hash(fileobj, block_size=1 << 20):
+    """SHA-256 of a seekable file object, read in blocks; leaves the file rewound"""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for block in iter(lambda: fileobj.read(block_size), b''):
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+class ImportCheckpoints:
+    """Per-file import progress in a local SQLite table, keyed by content hash"""
+
+    def __init__(self, path=CHECKPOINT_DB, stale_after=IMPORT_STALE_SECONDS):
+        self.path = path
+        self.stale_after = stale_after
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS imports (
+                    content_hash TEXT PRIMARY KEY,
+                    filename TEXT,
+                    chunk_size INTEGER,
+                    status TEXT,
+                    last_chunk INTEGER,
+                    report TEXT,
+                    error TEXT,
+                    created_at REAL,
+                    updated_at REAL
+                )
+            """)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _get(self, conn, content_hash):
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT * FROM imports WHERE content_hash = ?", (content_hash,)).fetchone()
+        if not row:
+            return None
+        record = dict(row)
+        record['report'] = json.loads(record['report']) if record['report'] else None
+        return record
+
+    def get(self, content_hash):
+        with self._connect() as conn:
+            return self._get(conn, content_hash)
+
+    def start(self, content_hash, filename, chunk_size, restart=False):
+        """Begin or resume an import; returns the existing record when there is progress to resume.
+
+        A completed record is returned as is. A record still 'running' and checkpointed within
+        `stale_after` seconds is returned with in_progress=True and left alone, so one file is
+        never written by two imports at once; an older 'running' record is taken over.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            # Check and claim in one write transaction so two uploads of a file cannot both start
+            conn.execute("BEGIN IMMEDIATE")
+            record = self._get(conn, content_hash)
+            if record and record['status'] == 'running' and now - record['updated_at'] < self.stale_after:
+                conn.execute("COMMIT")
+                return dict(record, in_progress=True)
+            if record and not restart and record['status'] == 'completed':
+                conn.execute("COMMIT")
+                return record
+            if record and not restart and record['chunk_size'] == chunk_size and record['last_chunk'] >= 0:
+                conn.execute("UPDATE imports SET status = 'running', error = NULL, updated_at = ? "
+                             "WHERE content_hash = ?", (now, content_hash))
+                conn.execute("COMMIT")
+                return record
+
+            conn.execute("INSERT OR REPLACE INTO imports VALUES (?, ?, ?, 'running', -1, NULL, NULL, ?, ?)",
+                         (content_hash, filename, chunk_size, now, now))
+            conn.execute("COMMIT")
+            return None
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def commit_chunk(self, content_hash, index, report):
+        """Record that chunk `index` and everything before it has been written"""
+        with self._connect() as conn:
+            conn.execute("UPDATE imports SET last_chunk = ?, report = ?, updated_at = ? WHERE content_hash = ?",
+                         (index, json.dumps(report), time.time(), content_hash))
+
+    def finish(self, content_hash, status, error=None):
+        with self._connect() as conn:
+            conn.execute("UPDATE imports SET status = ?, error = ?, updated_at = ? WHERE content_hash = ?",
+                         (status, error, time.time(), content_hash))
@@ -1,8 +1,20 @@
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import pandas as pd
 from config import SUPABASE_URL, SUPABASE_KEY
 
+BULK_BATCH_SIZE = int(os.getenv('SUPABASE_BATCH_SIZE', 500))
+BULK_MAX_IN_FLIGHT = int(os.getenv('SUPABASE_MAX_IN_FLIGHT', 4))
+# One keep-alive connection per request thread of a gunicorn worker (see gunicorn.conf.py)
+LOOKUP_POOL_SIZE = int(os.getenv('GUNICORN_THREADS', 4))
+LOOKUP_TIMEOUT = float(os.getenv('SUPABASE_LOOKUP_TIMEOUT', 10))
+
+_local = threading.local()
+_shared = {"pid": None, "session": None}
+_shared_lock = threading.Lock()
+
 def get_supabase_headers():
     """Get headers for Supabase API requests"""
     return {
@@ -76,6 +88,95 @@ def insert_student(student_data):
         print(f"[ERR] Failed to insert student: {e}")
         return False
 
+def _session():
+    """Per-thread keep-alive session for bulk requests"""
+    if not hasattr(_local, 'session'):
+        _local.session = requests.Session()
+    return _local.session
+
+def shared_session():
+    """Process-wide keep-alive session for single-row lookups from request threads"""
+    with _shared_lock:
+        # Created per process so a preloading server master never hands its sockets to workers
+        if _shared["pid"] != os.getpid():
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=LOOKUP_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _shared.update(pid=os.getpid(), session=session)
+        return _shared["session"]
+
+def fetch_student(rno):
+    """One student row by register number with Supabase's lowercase keys, or None; raises on network errors"""
+    response = shared_session().get(f"{SUPABASE_URL}/rest/v1/students", headers=get_supabase_headers(),
+                                    params={'rno': f'eq.{rno}', 'select': '*'}, timeout=LOOKUP_TIMEOUT)
+    if response.status_code != 200:
+        print(f"[ERR] Supabase API error: {response.status_code} - {response.text[:200]}")
+        return None
+    data = response.json()
+    return data[0] if data else None
+
+def fetch_students(rnos, batch_size=200):
+    """Rows for several register numbers keyed by rno, with lowercase keys; raises on network errors"""
+    rnos = list(dict.fromkeys(str(r) for r in rnos))
+    found = {}
+    for start in range(0, len(rnos), batch_size):
+        # Quoted so RNOs with commas or dots survive PostgREST's in.() list syntax
+        values = ','.join('"{}"'.format(r.replace('\\', '\\\\').replace('"', '\\"'))
+                          for r in rnos[start:start + batch_size])
+        response = shared_session().get(f"{SUPABASE_URL}/rest/v1/students", headers=get_supabase_headers(),
+                                        params={'rno': f'in.({values})', 'select': '*'}, timeout=LOOKUP_TIMEOUT)
+        if response.status_code != 200:
+            raise RuntimeError(f"Supabase API error: {response.status_code} - {response.text[:200]}")
+        found.update((str(row['rno']), row) for row in response.json())
+    return found
+
+def _send_batches(records, prefer, params=None, batch_size=None, max_in_flight=None):
+    """POST records in batches with several requests in flight; returns a per-batch report"""
+    batch_size = batch_size or BULK_BATCH_SIZE
+    max_in_flight = max_in_flight or BULK_MAX_IN_FLIGHT
+    url = f"{SUPABASE_URL}/rest/v1/students"
+    headers = get_supabase_headers()
+    headers['Prefer'] = prefer
+
+    # PostgREST needs every object in a bulk body to have the same keys
+    payload = [{k.lower(): v for k, v in r.items()} for r in records]
+    keys = sorted({k for r in payload for k in r})
+    payload = [{k: r.get(k) for k in keys} for r in payload]
+    starts = range(0, len(payload), batch_size)
+
+    def send(start):
+        batch = payload[start:start + batch_size]
+        try:
+            response = _session().post(url, headers=headers, params=params, json=batch, timeout=30)
+            if response.status_code in [200, 201, 204]:
+                return None
+            error = f"{response.status_code} - {response.text[:200]}"
+        except Exception as e:
+            error = str(e)
+        return {"start": start, "rows": len(batch), "error": error}
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        failed = [f for f in pool.map(send, starts) if f]
+
+    for f in failed:
+        print(f"[ERR] Bulk write batch at row {f['start']} failed: {f['error']}")
+    return {
+        "batches": len(starts),
+        "sent": len(payload) - sum(f["rows"] for f in failed),
+        "failed": failed
+    }
+
+def insert_students(records, batch_size=None, max_in_flight=None):
+    """Insert many student records, several batches at a time"""
+    return _send_batches(records, 'return=minimal',
+                         batch_size=batch_size, max_in_flight=max_in_flight)
+
+def upsert_students(records, batch_size=None, max_in_flight=None):
+    """Insert or update many student records keyed on rno, several batches at a time"""
+    return _send_batches(records, 'resolution=merge-duplicates,return=minimal', {'on_conflict': 'rno'},
+                         batch_size=batch_size, max_in_flight=max_in_flight)
+
 def update_student(rno, student_data):
     """Update an existing student record"""
     try:
@@ -107,6 +208,28 @@ def delete_student(rno):
         print(f"[ERR] Failed to delete student {rno}: {e}")
         return False
 
+def delete_students(rnos, batch_size=None):
+    """Delete many students by register number; returns the rnos whose batch failed"""
+    batch_size = batch_size or BULK_BATCH_SIZE
+    url = f"{SUPABASE_URL}/rest/v1/students"
+    headers = get_supabase_headers()
+    headers['Prefer'] = 'return=minimal'
+    failed = []
+
+    for start in range(0, len(rnos), batch_size):
+        batch = rnos[start:start + batch_size]
+        quoted = ','.join('"{}"'.format(str(r).replace('"', '\\"')) for r in batch)
+        try:
+            response = _session().delete(url, headers=headers, params={'rno': f'in.({quoted})'}, timeout=30)
+            if response.status_code in [200, 204]:
+                continue
+            error = f"{response.status_code} - {response.text[:200]}"
+        except Exception as e:
+            error = str(e)
+        print(f"[ERR] Bulk delete batch at row {start} failed: {error}")
+        failed.extend(batch)
+    return failed
+
 def get_stats():
     """Get basic statistics about the data"""
     try:
@@ -0,0 +1,49 @@
+import gc
+import os
+
+# Production server settings; every value can be overridden from the environment.
+# Start with: gunicorn -c gunicorn.conf.py wsgi:app
+
+# Workers are separate processes, so alert dedup and the per-mentor cap must live in a shared
+# file rather than in each worker's memory; set before the app (and throttle.py) is imported
+os.environ.setdefault('ALERT_THROTTLE_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                        'data', 'throttle.db'))
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+# Threads per worker let one process serve other users while a request waits on Supabase
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+# Recycling workers is opt-in: a recycled worker takes its import jobs down with it. When set,
+# worker_exit below stops them cleanly so a re-upload resumes; jitter keeps the workers from
+# all restarting at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+# Import the app (model, snapshot) once in the master and fork workers from it. Code changes
+# then need a USR2 binary upgrade or a restart; HUP only replaces the workers.
+preload_app = True
+accesslog = '-'
+errorlog = '-'
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far out of the collector's reach, so collections in the
+    # workers don't write to (and un-share) the preloaded pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Threads do not survive fork; each worker runs its own scanner, outbox and sweep threads
+    from app import start_background_services
+    start_background_services()
+
+
+def worker_exit(server, worker):
+    # Recycled or shut down: stop import jobs at their next chunk, closing their checkpoints so a
+    # re-upload resumes, within the graceful timeout less a margin before the master kills us
+    from app import stop_background_services
+    stop_background_services(timeout=max(server.cfg.graceful_timeout - 5, 0))
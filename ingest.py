@@ -0,0 +1,544 @@
+import os
+import argparse
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from model import SCORES, HEADS, load_model
+import db
+import supabase_db
+from checkpoints import ImportCheckpoints, file_hash
+from snapshot import CONTENT_COLUMNS, row_hashes, snapshot
+
+CHUNK_SIZE = int(os.getenv('INGEST_CHUNK_SIZE', 2000))
+# Where normalize-mode uploads are written: "copy" (direct Postgres), "rest" (Supabase API),
+# or "auto" to use COPY when a DATABASE_URL connection is available
+INGEST_SINK = os.getenv('INGEST_SINK', 'auto')
+# Processes used to normalize/validate/score chunks; 0 or 1 keeps the work in-process
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 0))
+MAX_REPORTED_ERRORS = 50
+
+# Columns of the students table; anything else in an upload is dropped before writing
+TEXT_COLUMNS = ['RNO', 'NAME', 'EMAIL', 'DEPT', 'MENTOR', 'MENTOR_EMAIL']
+INT_COLUMNS = ['YEAR', 'CURR_SEM', 'BATCH_YEAR']
+RAW_NUMERIC_COLUMNS = [
+    'SEM1', 'SEM2', 'SEM3', 'SEM4', 'SEM5', 'SEM6', 'SEM7', 'SEM8',
+    'INTERNAL_MARKS', 'TOTAL_DAYS_CURR', 'ATTENDED_DAYS_CURR',
+    'PREV_ATTENDANCE_PERC', 'BEHAVIOR_SCORE_10',
+]
+DERIVED_COLUMNS = [
+    'PAST_AVG', 'INTERNAL_PCT', 'ATTENDANCE_PCT', 'BEHAVIOR_PCT', 'PRESENT_ATT', 'PREV_ATT',
+    'PERFORMANCE_OVERALL', 'RISK_SCORE', 'DROPOUT_SCORE',
+    'PERFORMANCE_LABEL', 'RISK_LABEL', 'DROPOUT_LABEL',
+]
+STUDENT_COLUMNS = TEXT_COLUMNS + INT_COLUMNS + RAW_NUMERIC_COLUMNS + DERIVED_COLUMNS
+REQUIRED_COLUMNS = ['RNO', 'NAME', 'DEPT', 'YEAR']
+
+# Inclusive bounds checked during validation
+RANGES = {
+    'YEAR': (1, 4),
+    'CURR_SEM': (1, 8),
+    'INTERNAL_MARKS': (0, 30),
+    'BEHAVIOR_SCORE_10': (0, 10),
+    'PREV_ATTENDANCE_PERC': (0, 100),
+    **{f'SEM{i}': (0, 100) for i in range(1, 9)},
+}
+
+
+def read_csv_chunks(fileobj, chunk_size=CHUNK_SIZE):
+    """Yield DataFrames of at most chunk_size rows from a CSV file object"""
+    yield from pd.read_csv(fileobj, chunksize=chunk_size, dtype=str, skipinitialspace=True)
+
+
+def read_xlsx_chunks(fileobj, chunk_size=CHUNK_SIZE):
+    """Yield DataFrames of at most chunk_size rows from every sheet of an .xlsx workbook.
+
+    The workbook is opened in read-only mode, so rows stream from the sheet XML instead of
+    the whole workbook being loaded. Sheets without an RNO header column are skipped.
+    """
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("Excel uploads require the openpyxl package")
+
+    wb = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            rows = ws.iter_rows(values_only=True)
+            header = None
+            for row in rows:
+                if any(v is not None for v in row):
+                    header = [None if v is None else str(v).strip() for v in row]
+                    break
+            if not header or 'RNO' not in [str(h).upper() for h in header if h]:
+                print(f"[WARN] Skipping sheet '{ws.title}': no RNO header row")
+                continue
+
+            keep = [i for i, h in enumerate(header) if h]
+            columns = [header[i] for i in keep]
+            buffer = []
+            for row in rows:
+                if not any(v is not None for v in row):
+                    continue
+                # Cells come back typed; stringify them so both readers feed normalize_chunk the same input
+                buffer.append([None if i >= len(row) or row[i] is None else str(row[i]) for i in keep])
+                if len(buffer) >= chunk_size:
+                    yield pd.DataFrame(buffer, columns=columns)
+                    buffer = []
+            if buffer:
+                yield pd.DataFrame(buffer, columns=columns)
+    finally:
+        wb.close()
+
+
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx')
+
+
+def read_upload_chunks(fileobj, filename, chunk_size=CHUNK_SIZE):
+    """Pick the chunked reader for an upload by its file extension"""
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return read_csv_chunks(fileobj, chunk_size)
+    if name.endswith('.xlsx'):
+        return read_xlsx_chunks(fileobj, chunk_size)
+    raise ValueError("Only .csv and .xlsx files are supported")
+
+
+def estimate_rows(path):
+    """Cheap data-row count for progress/ETA: newlines for CSV, sheet dimensions for .xlsx"""
+    try:
+        if path.lower().endswith('.xlsx'):
+            from openpyxl import load_workbook
+            wb = load_workbook(path, read_only=True)
+            try:
+                return sum(max((ws.max_row or 1) - 1, 0) for ws in wb.worksheets)
+            finally:
+                wb.close()
+        lines, last = 0, b'\n'
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                lines += block.count(b'\n')
+                last = block[-1:]
+        if last != b'\n':
+            lines += 1
+        return max(lines - 1, 0)
+    except Exception as e:
+        print(f"[WARN] Could not estimate rows for {path}: {e}")
+        return None
+
+
+def normalize_chunk(df):
+    """Clean one chunk: uppercase headers, case-fold DEPT, coerce numbers"""
+    df = df.copy()
+    df.columns = df.columns.astype(str).str.strip().str.upper().str.replace(' ', '_')
+
+    for col in TEXT_COLUMNS:
+        if col in df.columns:
+            values = df[col].str.strip()
+            df[col] = values.where(values.notna() & (values != ''), None)
+    if 'DEPT' in df.columns:
+        df['DEPT'] = df['DEPT'].str.upper()
+
+    for col in INT_COLUMNS + RAW_NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    return df[[c for c in df.columns if c in STUDENT_COLUMNS]]
+
+
+def validate_chunk(df, offset=0):
+    """Split a normalized chunk into valid rows and a list of row errors"""
+    bad = np.zeros(len(df), dtype=bool)
+    reasons = np.empty(len(df), dtype=object)
+
+    def flag(mask, reason):
+        mask = np.asarray(mask, dtype=bool) & ~bad
+        reasons[mask] = reason
+        bad[mask] = True
+
+    for col in REQUIRED_COLUMNS:
+        if col not in df.columns:
+            flag(np.ones(len(df), dtype=bool), f"missing column {col}")
+        else:
+            flag(df[col].isna().to_numpy(), f"missing {col}")
+
+    for col, (lo, hi) in RANGES.items():
+        if col in df.columns:
+            values = df[col].to_numpy(dtype=float, na_value=np.nan)
+            flag((values < lo) | (values > hi), f"{col} out of range {lo}-{hi}")
+
+    if 'ATTENDED_DAYS_CURR' in df.columns and 'TOTAL_DAYS_CURR' in df.columns:
+        attended = df['ATTENDED_DAYS_CURR'].to_numpy(dtype=float, na_value=np.nan)
+        total = df['TOTAL_DAYS_CURR'].to_numpy(dtype=float, na_value=np.nan)
+        flag(attended > total, "ATTENDED_DAYS_CURR exceeds TOTAL_DAYS_CURR")
+
+    # Row numbers are 1-based data rows, after the header; valid rows keep theirs as the index
+    rnos = df['RNO'].to_numpy() if 'RNO' in df.columns else np.full(len(df), None)
+    errors = [{"row": int(offset + pos + 1), "RNO": rnos[pos], "error": reasons[pos]}
+              for pos in np.flatnonzero(bad)]
+    valid = df[~bad]
+    valid.index = offset + 1 + np.flatnonzero(~bad)
+    return valid, errors
+
+
+def score_chunk(df, model):
+    """Derive percentages and attach model scores and labels to a validated chunk"""
+    df = df.copy()
+    scored = model.predict_frame(df)
+    df['PAST_AVG'] = scored['past_avg'].round(2)
+    df['INTERNAL_PCT'] = scored['internal_pct'].round(2)
+    df['ATTENDANCE_PCT'] = scored['attendance_pct'].round(2)
+    df['BEHAVIOR_PCT'] = scored['behavior_pct'].round(2)
+    df['PRESENT_ATT'] = df['ATTENDANCE_PCT']
+    if 'PREV_ATTENDANCE_PERC' in df.columns:
+        df['PREV_ATT'] = df['PREV_ATTENDANCE_PERC']
+    for name in SCORES:
+        df[name.upper()] = scored[name].round(2)
+    for head in HEADS:
+        df[head.upper()] = scored[head]
+    for col in INT_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('Int64')
+    return df
+
+
+def prepare_records(records, model):
+    """Normalize, validate and score student dicts sent to the API, as one upload chunk.
+
+    Returns (scored, errors); scored is indexed by the 1-based position in `records`
+    and is None when no record was valid.
+    """
+    df = pd.DataFrame(records)
+    df.columns = df.columns.astype(str).str.strip().str.upper().str.replace(' ', '_')
+    # JSON gives typed values; text columns go through normalize_chunk as strings like CSV cells
+    for col in TEXT_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].map(lambda v: None if v is None or (not isinstance(v, str) and pd.isna(v)) else str(v))
+    return _prepare(df, 0, model)
+
+
+def dedupe_chunk(df, seen, stored=None):
+    """Drop rows that repeat an earlier row of the upload or match the stored row exactly.
+
+    `seen` maps RNO -> content hash for rows already taken from this upload and is updated in
+    place; the first row for an RNO wins. `stored` is the current table indexed by RNO.
+    Returns (rows to write, counts, conflicts), where conflicts are later rows for an RNO whose
+    content differs from the first one.
+    """
+    columns = [c for c in CONTENT_COLUMNS if c in df.columns]
+    hashes = row_hashes(df, columns).to_numpy()
+    rnos = df['RNO'].to_numpy()
+    keep = np.ones(len(df), dtype=bool)
+    counts = {"duplicates": 0, "conflicts": 0, "unchanged": 0}
+    conflicts = []
+
+    for pos, (rno, value) in enumerate(zip(rnos, hashes)):
+        first = seen.get(rno)
+        if first is None:
+            seen[rno] = value
+            continue
+        keep[pos] = False
+        if first == value:
+            counts["duplicates"] += 1
+        else:
+            counts["conflicts"] += 1
+            conflicts.append({"row": int(df.index[pos]), "RNO": rno,
+                              "error": "differs from an earlier row with the same RNO"})
+
+    if stored is not None and not stored.empty:
+        # Only the uploaded columns are written, so only those need to match the stored row
+        known = keep & pd.Index(rnos).isin(stored.index)
+        if known.any():
+            current = row_hashes(stored.loc[rnos[known]], columns).to_numpy()
+            unchanged = np.zeros(len(df), dtype=bool)
+            unchanged[known] = current == hashes[known]
+            keep &= ~unchanged
+            counts["unchanged"] = int(unchanged.sum())
+
+    return df[keep], counts, conflicts
+
+
+def to_records(df):
+    """JSON-safe list of dicts with lowercase keys, NaN turned into None"""
+    out = df.astype(object).where(pd.notna(df), None)
+    out.columns = out.columns.str.lower()
+    return out.to_dict('records')
+
+
+def written_mask(n, result):
+    """Boolean mask of the n records that landed, from a db bulk-write report"""
+    ok = np.ones(n, dtype=bool)
+    for batch in result["failed"]:
+        ok[batch["start"]:batch["start"] + batch["rows"]] = False
+    return ok
+
+
+def rest_writer(df, existing):
+    """Upsert a scored chunk through the Supabase REST API in parallel batches"""
+    records = to_records(df)
+    ok = written_mask(len(records), db.upsert_students(records))
+
+    counts = {"added": 0, "updated": 0, "failed": int((~ok).sum())}
+    for record, written in zip(records, ok):
+        if not written:
+            continue
+        if record['rno'] in existing:
+            counts["updated"] += 1
+        else:
+            counts["added"] += 1
+            existing.add(record['rno'])
+    return counts
+
+
+class CopyWriter:
+    """COPY + upsert chunk writer for one pipeline run.
+
+    The first chunk decides the sink: one direct connection is opened and reused for every
+    chunk, or, when none can be made, the whole run falls back to the REST writer instead
+    of waiting out the connect timeout again on every chunk.
+    """
+
+    def __init__(self, conn=None):
+        self.conn = conn
+        self.table_columns = supabase_db.students_columns(conn) if conn is not None else None
+        self.fallback = False
+
+    def __call__(self, df, existing):
+        if self.conn is None and not self.fallback:
+            self.conn = supabase_db.get_supabase_connection()
+            if self.conn is None:
+                print("[WARN] No direct Postgres connection; writing this import through the REST API")
+                self.fallback = True
+            else:
+                self.table_columns = supabase_db.students_columns(self.conn)
+        if self.fallback:
+            return rest_writer(df, existing)
+
+        result = supabase_db.bulk_load_students([df], self.conn, self.table_columns)
+        existing.update(df['RNO'])
+        return {"added": result["inserted"], "updated": result["updated"], "failed": 0}
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def get_writer(sink=None):
+    """Chunk writer for the configured sink; copy writers hold a connection, so use one per run"""
+    sink = sink or INGEST_SINK
+    if sink == "rest":
+        return rest_writer
+    if sink in ("copy", "auto"):
+        return CopyWriter()
+    raise ValueError(f"Unknown ingest sink '{sink}'")
+
+
+def new_report(mode):
+    return {
+        "mode": mode,
+        "processed_rows": 0,
+        "valid_rows": 0,
+        "invalid_rows": 0,
+        "added": 0,
+        "updated": 0,
+        "failed": 0,
+        "unchanged": 0,
+        "duplicates": 0,
+        "conflicts": 0,
+        "chunks": 0,
+        "errors": [],
+        "conflict_rows": [],
+        "label_counts": {head: {} for head in HEADS},
+    }
+
+
+def _prepare(chunk, offset, model):
+    valid, errors = validate_chunk(normalize_chunk(chunk), offset)
+    return (score_chunk(valid, model) if not valid.empty else None), errors
+
+
+_worker_model = None
+
+
+def _init_worker(model):
+    global _worker_model
+    _worker_model = model
+
+
+def _prepare_in_worker(chunk, offset):
+    return _prepare(chunk, offset, _worker_model)
+
+
+def _prepared(chunks, model, workers, skip=0):
+    """Yield (index, rows, scored, errors) per chunk in input order, optionally sharded over processes.
+
+    The first `skip` chunks are read (to keep row numbers right) but not processed.
+    """
+    def pending_chunks():
+        offset = 0
+        for index, chunk in enumerate(chunks):
+            if index >= skip:
+                yield index, chunk, offset
+            offset += len(chunk)
+
+    if workers <= 1:
+        for index, chunk, offset in pending_chunks():
+            yield (index, len(chunk)) + _prepare(chunk, offset, model)
+        return
+
+    # Keep a bounded window of chunks in flight and hand results back in submission order
+    # Fresh interpreters rather than fork: the web worker calling this already runs the outbox,
+    # scanner, sweep and job threads, and forking a threaded process can deadlock the child
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(model,)) as pool:
+        pending = deque()
+        for index, chunk, offset in pending_chunks():
+            pending.append((index, len(chunk), pool.submit(_prepare_in_worker, chunk, offset)))
+            if len(pending) >= workers * 2:
+                index, rows, future = pending.popleft()
+                yield (index, rows) + future.result()
+        while pending:
+            index, rows, future = pending.popleft()
+            yield (index, rows) + future.result()
+
+
+def prepare_chunks(chunks, model, report, workers=None, skip=0):
+    """Normalize, validate and score chunks lazily, tallying rows and errors into report.
+
+    Yields (index, scored) per chunk; scored is None when no row in the chunk was valid.
+    """
+    workers = INGEST_WORKERS if workers is None else workers
+    for index, rows, scored, errors in _prepared(chunks, model, workers, skip):
+        report["processed_rows"] += rows
+        report["chunks"] += 1
+        report["invalid_rows"] += len(errors)
+        room = MAX_REPORTED_ERRORS - len(report["errors"])
+        if room > 0:
+            report["errors"].extend(errors[:room])
+
+        if scored is not None:
+            report["valid_rows"] += len(scored)
+            for head in HEADS:
+                counts = report["label_counts"][head]
+                for label, n in scored[head.upper()].value_counts().items():
+                    counts[label] = counts.get(label, 0) + int(n)
+        yield index, scored
+
+
+def run_pipeline(chunks, model, mode="normalize", existing=None, writer=None, workers=None,
+                 checkpoint=None, resume=None, progress=None, stored=None):
+    """Normalize, validate, score and (in normalize mode) write each chunk in turn.
+
+    In normalize mode repeated RNOs within the upload and rows identical to `stored` (the
+    current table indexed by RNO) are skipped instead of written; see dedupe_chunk().
+
+    With checkpoint=(ImportCheckpoints, content_hash), every written chunk is committed to the
+    checkpoint store and the import stops at the first chunk with failed writes. Passing the
+    record returned by ImportCheckpoints.start() as `resume` skips chunks already written.
+    `progress(report)` is called after every chunk.
+    """
+    existing = set(existing) if existing is not None else set()
+    owned_writer = writer is None
+    writer = writer or get_writer()
+    report = new_report(mode)
+    skip = 0
+    if resume and resume.get("report"):
+        report.update(resume["report"])
+        skip = resume["last_chunk"] + 1
+    report["resumed_from_chunk"] = skip
+    report["status"] = "completed"
+    seen = {}
+
+    try:
+        for index, scored in prepare_chunks(chunks, model, report, workers, skip):
+            if mode == "normalize" and scored is not None:
+                scored, counts, conflicts = dedupe_chunk(scored, seen, stored)
+                for key, n in counts.items():
+                    report[key] += n
+                room = MAX_REPORTED_ERRORS - len(report["conflict_rows"])
+                if room > 0:
+                    report["conflict_rows"].extend(conflicts[:room])
+            if mode == "normalize" and scored is not None and not scored.empty:
+                counts = writer(scored, existing)
+                for key, n in counts.items():
+                    report[key] += n
+                if checkpoint and counts.get("failed"):
+                    report["status"] = "failed"
+                    report["failed_chunk"] = index
+                    break
+            if checkpoint:
+                checkpoint[0].commit_chunk(checkpoint[1], index, report)
+            if progress:
+                progress(report)
+    except Exception as e:
+        if checkpoint:
+            checkpoint[0].finish(checkpoint[1], "failed", str(e))
+        raise
+    finally:
+        if owned_writer and hasattr(writer, "close"):
+            writer.close()
+
+    if checkpoint:
+        error = f"Writes failed in chunk {report['failed_chunk']}" if report["status"] == "failed" else None
+        checkpoint[0].finish(checkpoint[1], report["status"], error)
+
+    report["total_students"] = report["valid_rows"]
+    report["total_records"] = len(existing)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load a student CSV or .xlsx file into the students table")
+    parser.add_argument("file", help="CSV or .xlsx file to import")
+    parser.add_argument("--sink", choices=["copy", "rest"], default="copy",
+                        help="copy: COPY + upsert per chunk over DATABASE_URL; rest: Supabase API batches")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS,
+                        help="processes for normalization and scoring (default: %(default)s)")
+    parser.add_argument("--restart", action="store_true",
+                        help="with --sink rest, ignore checkpoints from an earlier run of the same file")
+    args = parser.parse_args()
+
+    model = load_model()
+    # The current table, so rows already stored count as updated or unchanged rather than added
+    stored = snapshot.frame()
+    with open(args.file, "rb") as f:
+        chunks = read_upload_chunks(f, args.file, args.chunk_size)
+        if args.sink == "copy":
+            conn = supabase_db.get_supabase_connection()
+            if conn is None:
+                print("[ERR] No direct Postgres connection; set DATABASE_URL or use --sink rest")
+                raise SystemExit(1)
+            # Same dedupe as web uploads, so the first row for a repeated RNO wins either way
+            writer = CopyWriter(conn)
+            try:
+                report = run_pipeline(chunks, model, existing=stored.index, writer=writer, workers=args.workers,
+                                      stored=stored)
+            finally:
+                writer.close()
+        else:
+            # REST writes are per batch, so track progress and resume interrupted runs
+            store = ImportCheckpoints()
+            content_hash = file_hash(f)
+            resume = store.start(content_hash, os.path.basename(args.file), args.chunk_size, args.restart)
+            if resume and resume.get("in_progress"):
+                print("[ERR] This file is already being imported by another run")
+                raise SystemExit(1)
+            if resume:
+                print(f"Resuming from chunk {resume['last_chunk'] + 1}")
+            report = run_pipeline(chunks, model, existing=stored.index, writer=rest_writer, workers=args.workers,
+                                  checkpoint=(store, content_hash), resume=resume, stored=stored)
+
+    print(f"Processed {report['processed_rows']} rows in {report['chunks']} chunks: "
+          f"{report['added']} added, {report['updated']} updated, "
+          f"{report['unchanged']} unchanged, {report['duplicates']} duplicates, "
+          f"{report['conflicts']} conflicts, {report['invalid_rows']} invalid, {report['failed']} failed")
+    for error in report["errors"] + report["conflict_rows"]:
+        print(f"  row {error['row']} ({error['RNO']}): {error['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+JOBS_DB = os.getenv('JOBS_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'jobs.db'))
+# A running job whose worker has not reported progress for this long is reported as failed
+JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', 300))
+INTERRUPTED = "The server restarted during the import; upload the file again to resume"
+
+
+class JobQueue:
+    """Background worker pool for long-running imports, with job state kept in SQLite.
+
+    State lives in a file rather than in process memory so any web worker can answer
+    a progress poll, not only the one that accepted the upload.
+    """
+
+    def __init__(self, path=JOBS_DB, workers=JOB_WORKERS, stale_after=JOB_STALE_SECONDS):
+        self.path = path
+        self.workers = workers
+        self.stale_after = stale_after
+        self._pool = None
+        self._futures = {}
+        self._stopping = threading.Event()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT,
+                    description TEXT,
+                    status TEXT,
+                    total_rows INTEGER,
+                    rows_processed INTEGER,
+                    errors INTEGER,
+                    message TEXT,
+                    result TEXT,
+                    created_at REAL,
+                    started_at REAL,
+                    finished_at REAL,
+                    heartbeat_at REAL
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if 'heartbeat_at' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN heartbeat_at REAL")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _update(self, job_id, **fields):
+        columns = ', '.join(f"{k} = ?" for k in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", list(fields.values()) + [job_id])
+
+    def submit(self, kind, description, fn, total_rows=None):
+        """Queue fn(progress) on the worker pool and return the new job id.
+
+        fn receives a progress(rows_processed, errors) callback and returns
+        (message, result_dict); raising marks the job failed.
+        """
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute("INSERT INTO jobs VALUES (?, ?, ?, 'queued', ?, 0, 0, NULL, NULL, ?, NULL, NULL, NULL)",
+                         (job_id, kind, description, total_rows, time.time()))
+
+        # Created lazily so a pre-fork server master never owns worker threads
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job-worker")
+        self._futures = {k: f for k, f in self._futures.items() if not f.done()}
+        self._futures[job_id] = self._pool.submit(self._run, job_id, fn)
+        return job_id
+
+    def _run(self, job_id, fn):
+        now = time.time()
+        self._update(job_id, status='running', started_at=now, heartbeat_at=now)
+
+        # Each progress report doubles as a heartbeat, so a job whose worker died can be told apart
+        def progress(rows_processed, errors=0):
+            self._update(job_id, rows_processed=rows_processed, errors=errors, heartbeat_at=time.time())
+            if self._stopping.is_set():
+                # Stop at a chunk boundary, so the import's checkpoint is closed and a re-upload resumes
+                raise RuntimeError(INTERRUPTED)
+
+        try:
+            message, result = fn(progress)
+            status = 'failed' if result.get('status') == 'failed' else 'completed'
+            self._update(job_id, status=status, message=message, result=json.dumps(result),
+                         rows_processed=result.get('processed_rows', 0),
+                         errors=result.get('invalid_rows', 0) + result.get('failed', 0),
+                         finished_at=time.time())
+        except Exception as e:
+            print(f"[ERR] Job {job_id} failed: {e}")
+            self._update(job_id, status='failed', message=str(e), finished_at=time.time())
+
+    def drain(self, timeout):
+        """Stop every job at its next chunk and wait up to `timeout` seconds for them to wind down.
+
+        Called as the worker process exits. Interrupted jobs are marked failed with a message
+        to upload the file again, which resumes from the last committed chunk.
+        """
+        if self._pool is None:
+            return 0
+        pending = {job_id: f for job_id, f in self._futures.items() if not f.done()}
+        self._stopping.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        wait(list(pending.values()), timeout=timeout)
+        unfinished = [job_id for job_id, f in pending.items() if not f.done() or f.cancelled()]
+        if unfinished:
+            now = time.time()
+            with self._connect() as conn:
+                conn.executemany("UPDATE jobs SET status = 'failed', message = ?, finished_at = ? "
+                                 "WHERE id = ? AND status IN ('queued', 'running')",
+                                 [(INTERRUPTED, now, job_id) for job_id in unfinished])
+        if pending:
+            print(f"[WARN] Worker exiting: interrupted {len(pending)} jobs")
+        return len(pending)
+
+    def get(self, job_id):
+        """Job state with throughput (rows/s) and ETA (seconds) derived from progress so far"""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        if job['status'] == 'running' and time.time() - (job['heartbeat_at'] or job['started_at']) > self.stale_after:
+            # The worker was recycled or the deploy restarted mid-import; nothing will finish this job
+            job.update(status='failed', finished_at=job['heartbeat_at'] or job['started_at'],
+                       message="The import stopped reporting progress (server restarted?); upload the file "
+                               "again to resume")
+            with self._connect() as conn:
+                conn.execute("UPDATE jobs SET status = ?, message = ?, finished_at = ? WHERE id = ? "
+                             "AND status = 'running'", (job['status'], job['message'], job['finished_at'], job_id))
+        end = job['finished_at'] or time.time()
+        elapsed = end - job['started_at'] if job['started_at'] else 0.0
+        job['elapsed'] = round(elapsed, 2)
+        job['throughput'] = round(job['rows_processed'] / elapsed, 1) if elapsed > 0 else 0.0
+
+        job['eta'] = None
+        if job['status'] == 'running' and job['total_rows'] and job['throughput'] > 0:
+            remaining = max(job['total_rows'] - job['rows_processed'], 0)
+            job['eta'] = round(remaining / job['throughput'], 1)
+        elif job['status'] in ('completed', 'failed'):
+            job['eta'] = 0.0
+        return job
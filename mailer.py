@@ -0,0 +1,128 @@
+import os
+import time
+import queue
+import smtplib
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', 587))
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', 'True').lower() == 'true'
+SMTP_TIMEOUT = int(os.getenv('SMTP_TIMEOUT', 30))
+# Authenticated connections kept open between sends
+SMTP_POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', 2))
+# Idle connections older than this are checked with NOOP before reuse
+SMTP_CHECK_AFTER = int(os.getenv('SMTP_CHECK_AFTER_SECONDS', 30))
+EMAIL_USER = os.getenv('EMAIL_USER')
+EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD')
+
+
+def _connection_lost(error):
+    """True for errors that mean the session is gone, as opposed to a rejected message"""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException) and error.smtp_code == 421:
+        return True
+    # SMTPException subclasses OSError; only plain socket errors count here
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class SMTPConnectionPool:
+    """Reusable logged-in SMTP sessions shared by every alert send.
+
+    Connecting, STARTTLS and AUTH happen once per pooled connection instead of once per
+    message. A connection that sat idle is NOOP-checked before reuse, and a send that hits
+    a dropped session is retried once on a fresh connection.
+    """
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, user=EMAIL_USER, password=EMAIL_PASSWORD,
+                 starttls=SMTP_STARTTLS, size=SMTP_POOL_SIZE, timeout=SMTP_TIMEOUT, check_after=SMTP_CHECK_AFTER):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.check_after = check_after
+        self.stats = {"connects": 0, "reconnects": 0, "sent": 0}
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def configured(self):
+        return bool(self.host and self.user and self.password)
+
+    def _connect(self):
+        conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                conn.starttls()
+            if self.user and self.password:
+                conn.login(self.user, self.password)
+        except Exception:
+            self._close(conn)
+            raise
+        self.stats["connects"] += 1
+        return conn
+
+    def _close(self, conn):
+        try:
+            conn.quit()
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _checkout(self):
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.time() - last_used < self.check_after:
+                return conn
+            try:
+                if conn.noop()[0] == 250:
+                    return conn
+            except Exception:
+                pass
+            self._close(conn)
+            self.stats["reconnects"] += 1
+
+    def _checkin(self, conn):
+        self._idle.put((conn, time.time()))
+
+    def send(self, msg):
+        """Send an email.message.Message over a pooled connection"""
+        with self._slots:
+            for attempt in range(2):
+                conn = self._checkout()
+                try:
+                    conn.send_message(msg)
+                except Exception as e:
+                    if not _connection_lost(e):
+                        # The message was refused but the session is still usable
+                        self._checkin(conn)
+                        raise
+                    self._close(conn)
+                    self.stats["reconnects"] += 1
+                    if attempt:
+                        raise
+                    continue
+                self._checkin(conn)
+                self.stats["sent"] += 1
+                return
+
+    def close(self):
+        """QUIT every idle connection"""
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(conn)
+
+
+smtp_pool = SMTPConnectionPool()
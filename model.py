@@ -0,0 +1,308 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+# Inputs to every score and label, in column order of the feature matrix
+FEATURES = ["past_avg", "internal_pct", "attendance_pct", "behavior_pct"]
+SCORES = ["performance_overall", "risk_score", "dropout_score"]
+HEADS = {
+    "performance_label": ("PERFORMANCE_LABEL", ["high", "medium", "low", "poor"]),
+    "risk_label": ("RISK_LABEL", ["high", "medium", "low"]),
+    "dropout_label": ("DROPOUT_LABEL", ["high", "medium", "low"]),
+}
+
+MODEL_PATH = os.getenv('MODEL_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'risk_model.npz'))
+
+# Raw-column defaults used when a value is missing (same as the predict form)
+RAW_DEFAULTS = {
+    "INTERNAL_MARKS": 15.0,
+    "ATTENDED_DAYS_CURR": 45.0,
+    "TOTAL_DAYS_CURR": 90.0,
+    "BEHAVIOR_SCORE_10": 5.0,
+}
+SEM_COLS = [f"SEM{i}" for i in range(1, 9)]
+
+# Rule-based weights: performance = 40% internals + 40% attendance + 20% behaviour,
+# risk and dropout are its complement. Rows follow FEATURES, columns follow SCORES.
+DEFAULT_SCORE_WEIGHTS = np.array([
+    [0.0, 0.0, 0.0],
+    [0.4, -0.4, -0.4],
+    [0.4, -0.4, -0.4],
+    [0.2, -0.2, -0.2],
+])
+DEFAULT_SCORE_BIAS = np.array([0.0, 100.0, 100.0])
+
+
+def _numeric(df, col, default):
+    if col not in df.columns:
+        return np.full(len(df), default, dtype=float)
+    return pd.to_numeric(df[col], errors='coerce').fillna(default).to_numpy(dtype=float)
+
+
+def feature_matrix(df):
+    """Build the (n, 4) feature matrix from a student DataFrame with uppercase columns"""
+    n = len(df)
+    sems = np.zeros((n, len(SEM_COLS)))
+    for j, col in enumerate(SEM_COLS):
+        if col in df.columns:
+            sems[:, j] = _numeric(df, col, 0.0)
+    taken = sems > 0
+    counts = taken.sum(axis=1)
+    past_avg = np.where(counts > 0, (sems * taken).sum(axis=1) / np.maximum(counts, 1), 0.0)
+
+    internal = _numeric(df, "INTERNAL_MARKS", RAW_DEFAULTS["INTERNAL_MARKS"])
+    attended = _numeric(df, "ATTENDED_DAYS_CURR", RAW_DEFAULTS["ATTENDED_DAYS_CURR"])
+    total = _numeric(df, "TOTAL_DAYS_CURR", RAW_DEFAULTS["TOTAL_DAYS_CURR"])
+    behavior = _numeric(df, "BEHAVIOR_SCORE_10", RAW_DEFAULTS["BEHAVIOR_SCORE_10"])
+
+    X = np.empty((n, len(FEATURES)))
+    X[:, 0] = past_avg
+    X[:, 1] = internal / 30.0 * 100.0
+    X[:, 2] = np.where(total > 0, attended / np.where(total > 0, total, 1.0) * 100.0, 0.0)
+    X[:, 3] = behavior / 10.0 * 100.0
+    return X
+
+
+def student_features(student):
+    """Build a (1, 4) feature matrix from a single student dict without going through pandas"""
+    def num(key, default):
+        try:
+            value = student.get(key)
+            return default if value in (None, "") else float(value)
+        except (TypeError, ValueError):
+            return default
+
+    sems = [num(col, 0.0) for col in SEM_COLS]
+    taken = [s for s in sems if s > 0]
+    total = num("TOTAL_DAYS_CURR", RAW_DEFAULTS["TOTAL_DAYS_CURR"])
+    attended = num("ATTENDED_DAYS_CURR", RAW_DEFAULTS["ATTENDED_DAYS_CURR"])
+
+    return np.array([[
+        sum(taken) / len(taken) if taken else 0.0,
+        num("INTERNAL_MARKS", RAW_DEFAULTS["INTERNAL_MARKS"]) / 30.0 * 100.0,
+        attended / total * 100.0 if total > 0 else 0.0,
+        num("BEHAVIOR_SCORE_10", RAW_DEFAULTS["BEHAVIOR_SCORE_10"]) / 10.0 * 100.0,
+    ]])
+
+
+def performance_labels(scores):
+    """Rule-based performance label for an array of performance scores"""
+    return np.select([scores >= 75, scores >= 50, scores >= 25], ["high", "medium", "low"], "poor")
+
+
+def risk_labels(scores):
+    """Rule-based risk/dropout label for an array of risk scores"""
+    return np.select([scores >= 70, scores >= 40], ["high", "medium"], "low")
+
+
+def need_alert(performance_label, risk_label, dropout_label):
+    """Mentor alert rule; works on scalars and on label arrays"""
+    return (np.isin(performance_label, ["poor", "low"]) |
+            (np.asarray(risk_label) == "high") |
+            (np.asarray(dropout_label) == "high"))
+
+
+class RiskModel:
+    """Linear scores plus optional multinomial logistic label heads, evaluated as one matmul"""
+
+    def __init__(self, score_weights=DEFAULT_SCORE_WEIGHTS, score_bias=DEFAULT_SCORE_BIAS,
+                 label_weights=None, label_bias=None, label_classes=None):
+        self.score_weights = np.asarray(score_weights, dtype=float)
+        self.score_bias = np.asarray(score_bias, dtype=float)
+        self.trained = label_weights is not None
+        self.label_classes = label_classes or {}
+
+        # Stack every output column so a prediction is a single X @ W + b
+        if self.trained:
+            self.weights = np.hstack([self.score_weights, label_weights])
+            self.bias = np.concatenate([self.score_bias, label_bias])
+        else:
+            self.weights = self.score_weights
+            self.bias = self.score_bias
+
+        self.slices = {}
+        start = len(SCORES)
+        for head in HEADS:
+            width = len(self.label_classes.get(head, []))
+            self.slices[head] = slice(start, start + width)
+            start += width
+
+    def predict(self, X):
+        """Score a feature matrix; returns score columns and label arrays keyed by output name"""
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        out = X @ self.weights + self.bias
+
+        result = {name: out[:, i] for i, name in enumerate(SCORES)}
+        if self.trained:
+            for head in HEADS:
+                classes = np.asarray(self.label_classes[head])
+                result[head] = classes[out[:, self.slices[head]].argmax(axis=1)]
+        else:
+            result["performance_label"] = performance_labels(result["performance_overall"])
+            result["risk_label"] = risk_labels(result["risk_score"])
+            result["dropout_label"] = risk_labels(result["dropout_score"])
+        return result
+
+    def contributions(self, X):
+        """Per-feature contribution to each score: (n, features, scores) array plus the score bias"""
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        return X[:, :, None] * self.score_weights[None, :, :], self.score_bias
+
+    def explain(self, X):
+        """Contributions as one {score: {feature: value, "base": bias}} dict per row"""
+        contrib, bias = self.contributions(X)
+        contrib = np.round(contrib, 2).tolist()
+        rows = []
+        for row in contrib:
+            rows.append({
+                score: dict({f: row[i][j] for i, f in enumerate(FEATURES)}, base=round(float(bias[j]), 2))
+                for j, score in enumerate(SCORES)
+            })
+        return rows
+
+    def predict_frame(self, df):
+        """Score every row of a student DataFrame; returns a DataFrame aligned to df.index"""
+        X = feature_matrix(df)
+        preds = self.predict(X)
+        out = pd.DataFrame(X, columns=FEATURES, index=df.index)
+        for name in SCORES + list(HEADS):
+            out[name] = preds[name]
+        return out
+
+    def save(self, path):
+        """Write the model weights to a compact .npz artifact"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        arrays = {
+            "features": np.array(FEATURES),
+            "score_weights": self.score_weights,
+            "score_bias": self.score_bias,
+        }
+        if self.trained:
+            arrays["label_weights"] = self.weights[:, len(SCORES):]
+            arrays["label_bias"] = self.bias[len(SCORES):]
+            for head, classes in self.label_classes.items():
+                arrays[f"classes_{head}"] = np.array(classes)
+        np.savez(path, **arrays)
+
+
+def load_model(path=MODEL_PATH):
+    """Load the trained model artifact, falling back to the rule-based weights"""
+    if not path or not os.path.exists(path):
+        print("[INFO] No trained model artifact found; using rule-based scoring.")
+        return RiskModel()
+
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if list(data["features"]) != FEATURES:
+                print(f"[WARN] Model artifact {path} has unexpected features; using rule-based scoring.")
+                return RiskModel()
+            if "label_weights" not in data:
+                return RiskModel(data["score_weights"], data["score_bias"])
+            classes = {head: [str(c) for c in data[f"classes_{head}"]] for head in HEADS}
+            return RiskModel(data["score_weights"], data["score_bias"],
+                             data["label_weights"], data["label_bias"], classes)
+    except Exception as e:
+        print(f"[ERR] Failed to load model {path}: {e}")
+        return RiskModel()
+
+
+def _fit_softmax(Z, y, n_classes, epochs=500, lr=0.5, l2=1e-3):
+    """Full-batch gradient descent for multinomial logistic regression on standardized inputs"""
+    n, d = Z.shape
+    W = np.zeros((d, n_classes))
+    b = np.zeros(n_classes)
+    Y = np.eye(n_classes)[y]
+    for _ in range(epochs):
+        logits = Z @ W + b
+        logits -= logits.max(axis=1, keepdims=True)
+        P = np.exp(logits)
+        P /= P.sum(axis=1, keepdims=True)
+        G = (P - Y) / n
+        W -= lr * (Z.T @ G + l2 * W)
+        b -= lr * G.sum(axis=0)
+    return W, b
+
+
+def train_model(df, epochs=500):
+    """Fit score regressions and label classifiers on the historical student table"""
+    X = feature_matrix(df)
+
+    # Scores: least squares on the stored scores, keeping the rule weights for missing columns
+    score_weights = DEFAULT_SCORE_WEIGHTS.copy()
+    score_bias = DEFAULT_SCORE_BIAS.copy()
+    A = np.hstack([X, np.ones((len(X), 1))])
+    for j, name in enumerate(SCORES):
+        if name.upper() not in df.columns:
+            continue
+        target = pd.to_numeric(df[name.upper()], errors='coerce').to_numpy(dtype=float)
+        ok = ~np.isnan(target)
+        if ok.sum() <= len(FEATURES):
+            continue
+        coef = np.linalg.lstsq(A[ok], target[ok], rcond=None)[0]
+        score_weights[:, j] = coef[:-1]
+        score_bias[j] = coef[-1]
+
+    # Labels: softmax regression on standardized features, folded back into raw-feature weights
+    mu = X.mean(axis=0)
+    sd = X.std(axis=0)
+    sd[sd == 0] = 1.0
+    Z = (X - mu) / sd
+
+    label_weights, label_bias, label_classes = [], [], {}
+    for head, (col, known) in HEADS.items():
+        labels = df[col].astype(str).str.lower() if col in df.columns else pd.Series([], dtype=str)
+        present = [c for c in known if (labels == c).any()]
+        if not present:
+            raise ValueError(f"No {col} values to train on")
+        index = {c: i for i, c in enumerate(present)}
+        ok = labels.isin(present).to_numpy()
+        y = labels[ok].map(index).to_numpy(dtype=int)
+
+        if len(present) == 1:
+            W = np.zeros((len(FEATURES), 1))
+            b = np.zeros(1)
+        else:
+            W, b = _fit_softmax(Z[ok], y, len(present), epochs=epochs)
+
+        label_weights.append(W / sd[:, None])
+        label_bias.append(b - (mu / sd) @ W)
+        label_classes[head] = present
+
+    return RiskModel(score_weights, score_bias,
+                     np.hstack(label_weights), np.concatenate(label_bias), label_classes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the EduMetric risk/dropout model")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train = sub.add_parser("train", help="fit the model on the students table and save the weights")
+    train.add_argument("--csv", help="train from a CSV export instead of Supabase")
+    train.add_argument("--out", default=MODEL_PATH, help="artifact path (default: %(default)s)")
+    train.add_argument("--epochs", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.csv:
+        df = pd.read_csv(args.csv)
+        df.columns = df.columns.str.upper()
+    else:
+        from db import load_students_df
+        df = load_students_df()
+
+    if df.empty:
+        print("[ERR] No student data to train on")
+        raise SystemExit(1)
+
+    model = train_model(df, epochs=args.epochs)
+    model.save(args.out)
+
+    preds = model.predict(feature_matrix(df))
+    print(f"Trained on {len(df)} students -> {args.out}")
+    for head, (col, _) in HEADS.items():
+        if col in df.columns:
+            acc = (preds[head] == df[col].astype(str).str.lower().to_numpy()).mean()
+            print(f"  {head}: {acc:.1%} training accuracy")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import os
+import json
+import time
+import uuid
+import email
+import smtplib
+import sqlite3
+import threading
+from mailer import smtp_pool
+from throttle import throttle
+
+OUTBOX_DB = os.getenv('OUTBOX_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'outbox.db'))
+OUTBOX_WORKERS = int(os.getenv('OUTBOX_WORKERS', 2))
+OUTBOX_POLL_SECONDS = float(os.getenv('OUTBOX_POLL_SECONDS', 1))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 6))
+# Retry n waits RETRY_BASE * 2**(n-1) seconds, capped at RETRY_MAX
+OUTBOX_RETRY_BASE = float(os.getenv('OUTBOX_RETRY_BASE_SECONDS', 30))
+OUTBOX_RETRY_MAX = float(os.getenv('OUTBOX_RETRY_MAX_SECONDS', 3600))
+# A claimed message whose worker died is picked up again after this long
+OUTBOX_LEASE_SECONDS = float(os.getenv('OUTBOX_LEASE_SECONDS', 300))
+
+
+def _permanent(error):
+    """5xx replies and refused recipients will fail the same way on every retry"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+class AlertOutbox:
+    """Durable queue of outgoing emails in SQLite, delivered by background worker threads.
+
+    Callers only write a row, so request latency does not depend on the mail server.
+    Workers claim due rows with a lease, send them through the shared SMTP pool and
+    reschedule failures with exponential backoff.
+    """
+
+    def __init__(self, path=OUTBOX_DB, send=None, workers=OUTBOX_WORKERS, poll=OUTBOX_POLL_SECONDS,
+                 max_attempts=OUTBOX_MAX_ATTEMPTS, retry_base=OUTBOX_RETRY_BASE, retry_max=OUTBOX_RETRY_MAX,
+                 on_failed=None):
+        self.path = path
+        self.send = send or smtp_pool.send
+        # Called with a message's meta dict once it is marked failed for good
+        self.on_failed = on_failed
+        self.workers = workers
+        self.poll = poll
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._start_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT,
+                    recipient TEXT,
+                    subject TEXT,
+                    message TEXT,
+                    meta TEXT,
+                    status TEXT,
+                    attempts INTEGER,
+                    next_attempt_at REAL,
+                    locked_until REAL,
+                    last_error TEXT,
+                    created_at REAL,
+                    sent_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def enqueue(self, msg, kind="alert", meta=None):
+        """Store an email.message.Message for delivery and return its id"""
+        alert_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("INSERT INTO outbox VALUES (?, ?, ?, ?, ?, ?, 'queued', 0, ?, NULL, NULL, ?, NULL)",
+                         (alert_id, kind, msg['To'], msg['Subject'], msg.as_string(),
+                          json.dumps(meta or {}), now, now))
+        self.start()
+        self._wake.set()
+        return alert_id
+
+    def _claim(self):
+        """Take the next due message, or None; the lease keeps other workers off it"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("""
+                SELECT id, message, attempts, meta FROM outbox
+                WHERE (status IN ('queued', 'retry') AND next_attempt_at <= ?)
+                   OR (status = 'sending' AND locked_until < ?)
+                ORDER BY next_attempt_at LIMIT 1
+            """, (now, now)).fetchone()
+            if row:
+                conn.execute("UPDATE outbox SET status = 'sending', attempts = attempts + 1, locked_until = ? "
+                             "WHERE id = ?", (now + OUTBOX_LEASE_SECONDS, row[0]))
+            conn.execute("COMMIT")
+            return row
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _deliver(self, alert_id, message, attempts, meta=None):
+        try:
+            self.send(email.message_from_string(message))
+        except Exception as e:
+            attempts += 1
+            if _permanent(e) or attempts >= self.max_attempts:
+                status, next_at = 'failed', None
+                print(f"[ERR] Alert {alert_id} failed after {attempts} attempt(s): {e}")
+            else:
+                status = 'retry'
+                next_at = time.time() + min(self.retry_base * 2 ** (attempts - 1), self.retry_max)
+                print(f"[WARN] Alert {alert_id} attempt {attempts} failed, retrying: {e}")
+            with self._connect() as conn:
+                conn.execute("UPDATE outbox SET status = ?, next_attempt_at = ?, locked_until = NULL, "
+                             "last_error = ? WHERE id = ?", (status, next_at, str(e)[:500], alert_id))
+            if status == 'failed' and self.on_failed:
+                try:
+                    self.on_failed(json.loads(meta) if meta else {})
+                except Exception as hook_error:
+                    print(f"[WARN] Failed-alert hook for {alert_id} raised: {hook_error}")
+            return
+
+        with self._connect() as conn:
+            conn.execute("UPDATE outbox SET status = 'sent', sent_at = ?, locked_until = NULL, last_error = NULL "
+                         "WHERE id = ?", (time.time(), alert_id))
+
+    def process_due(self):
+        """Deliver messages until none is due; returns how many were attempted"""
+        count = 0
+        while not self._stop.is_set():
+            row = self._claim()
+            if not row:
+                return count
+            self._deliver(*row)
+            count += 1
+        return count
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.process_due()
+            except Exception as e:
+                print(f"[ERR] Outbox worker error: {e}")
+            self._wake.wait(self.poll)
+            self._wake.clear()
+
+    def start(self):
+        """Start the delivery workers if they are not already running in this process"""
+        with self._start_lock:
+            if any(t.is_alive() for t in self._threads):
+                return
+            self._stop.clear()
+            self._threads = [threading.Thread(target=self._loop, name=f"outbox-worker-{i}", daemon=True)
+                             for i in range(self.workers)]
+            for t in self._threads:
+                t.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def get(self, alert_id):
+        """Delivery state of one message, without its body"""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT id, kind, recipient, subject, meta, status, attempts, next_attempt_at, "
+                               "last_error, created_at, sent_at FROM outbox WHERE id = ?", (alert_id,)).fetchone()
+        if not row:
+            return None
+        alert = dict(row)
+        alert['meta'] = json.loads(alert['meta']) if alert['meta'] else {}
+        return alert
+
+    def counts(self):
+        """Number of messages per delivery status"""
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+
+def release_throttle(meta):
+    """An alert that will never arrive must not count as sent for the dedup window"""
+    throttle.release(meta.get("throttle_keys"))
+
+
+outbox = AlertOutbox(on_failed=release_throttle)
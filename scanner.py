@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+from model import HEADS
+from snapshot import row_hashes, CONTENT_COLUMNS
+from alerts import alert_mask
+
+SCAN_INTERVAL = int(os.getenv('SCAN_INTERVAL_SECONDS', 60))
+# Stored labels decide who is at risk, so a relabel alone is a change too
+SCAN_COLUMNS = CONTENT_COLUMNS + [head.upper() for head in HEADS]
+SCANNER_DB = os.getenv('SCANNER_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'scanner.db'))
+
+
+def _text(value):
+    return "" if value is None or pd.isna(value) else str(value)
+
+
+class EarlyWarningScanner:
+    """Keeps the at-risk set current by re-checking only rows whose content or labels changed.
+
+    Row hashes and the at-risk set (with when each student was first flagged) live in SQLite,
+    so a restart does not re-flag everyone and every web worker answers from the same state.
+    """
+
+    def __init__(self, snapshot, interval=SCAN_INTERVAL, path=SCANNER_DB):
+        self.snapshot = snapshot
+        self.interval = interval
+        self.path = path
+        self.last_run = None
+        self.runs = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS scan_hashes (rno TEXT PRIMARY KEY, hash INTEGER)")
+            conn.execute("CREATE TABLE IF NOT EXISTS at_risk (rno TEXT PRIMARY KEY, entry TEXT, flagged_at REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS at_risk_flagged_at ON at_risk (flagged_at)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def scan(self):
+        """Re-check rows added or changed since the last scan; returns what changed"""
+        with self._lock:
+            df = self.snapshot.frame()
+            # SQLite integers are signed, so hashes are stored as the same 64 bits read as int64
+            hashes = row_hashes(df, SCAN_COLUMNS)
+            hashes = pd.Series(hashes.to_numpy().view(np.int64), index=hashes.index)
+            conn = self._connect()
+            try:
+                # One write lock per scan, so two workers never interleave their diffs
+                conn.execute("BEGIN IMMEDIATE")
+                stored = pd.Series(dict(conn.execute("SELECT rno, hash FROM scan_hashes").fetchall()), dtype='int64')
+                known = hashes.index.isin(stored.index)
+                previous = stored.reindex(hashes.index, fill_value=0).to_numpy()
+                changed = hashes.index[~known | (previous != hashes.to_numpy())]
+                removed = stored.index.difference(hashes.index)
+                now = time.time()
+
+                conn.executemany("DELETE FROM at_risk WHERE rno = ?", [(rno,) for rno in removed])
+                conn.executemany("DELETE FROM scan_hashes WHERE rno = ?", [(rno,) for rno in removed])
+
+                newly = 0
+                if len(changed):
+                    rows = df.loc[changed]
+                    flagged = alert_mask(rows)
+                    first_seen = dict(conn.execute("SELECT rno, flagged_at FROM at_risk").fetchall())
+                    cleared, entries = [], []
+                    for i, rno in enumerate(changed):
+                        if not flagged[i]:
+                            cleared.append((rno,))
+                            continue
+                        row = rows.iloc[i]
+                        entry = {
+                            "RNO": rno,
+                            "NAME": _text(row.get("NAME")),
+                            "DEPT": _text(row.get("DEPT")),
+                            "YEAR": _text(row.get("YEAR")),
+                            "MENTOR": _text(row.get("MENTOR")),
+                            "MENTOR_EMAIL": _text(row.get("MENTOR_EMAIL")),
+                            **{head: _text(row.get(head.upper())).strip().lower() for head in HEADS},
+                        }
+                        # Students who stay at risk keep the time they were first flagged
+                        if rno not in first_seen:
+                            newly += 1
+                        entries.append((rno, json.dumps(entry), first_seen.get(rno, now)))
+                    conn.executemany("DELETE FROM at_risk WHERE rno = ?", cleared)
+                    conn.executemany("INSERT OR REPLACE INTO at_risk VALUES (?, ?, ?)", entries)
+                    conn.executemany("INSERT OR REPLACE INTO scan_hashes VALUES (?, ?)",
+                                     [(rno, int(h)) for rno, h in hashes.loc[changed].items()])
+                at_risk = conn.execute("SELECT COUNT(*) FROM at_risk").fetchone()[0]
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+
+            self.last_run = now
+            self.runs += 1
+            return {"changed": len(changed), "removed": len(removed),
+                    "newly_at_risk": newly, "at_risk": at_risk}
+
+    def newly_at_risk(self, since=0.0):
+        """At-risk students first flagged after the given epoch timestamp, newest first"""
+        if self.last_run is None:
+            self.scan()
+        with self._connect() as conn:
+            rows = conn.execute("SELECT entry, flagged_at FROM at_risk WHERE flagged_at > ? ORDER BY flagged_at DESC",
+                                (since,)).fetchall()
+        return [dict(json.loads(entry), flagged_at=flagged_at) for entry, flagged_at in rows]
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.scan()
+            except Exception as e:
+                print(f"[ERR] Early-warning scan failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Run scans on a daemon thread every `interval` seconds"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="early-warning-scanner", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from datetime import datetime, timedelta
+from model import HEADS, load_model, need_alert
+from snapshot import snapshot
+from alerts import queue_digests
+from mailer import smtp_pool
+from outbox import outbox
+from throttle import throttle
+
+# Local wall-clock time of the nightly sweep, HH:MM
+SWEEP_AT = os.getenv('NIGHTLY_SWEEP_AT', '02:00')
+SWEEP_DB = os.getenv('SWEEP_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sweeps.db'))
+
+
+def next_run(at=SWEEP_AT, now=None):
+    """Next datetime at the given HH:MM, today if it is still ahead, else tomorrow"""
+    now = now or datetime.now()
+    hour, minute = (int(part) for part in at.split(':'))
+    run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    return run if run > now else run + timedelta(days=1)
+
+
+class NightlySweep:
+    """Once-a-night rescoring of the whole table that alerts mentors only about newly at-risk students.
+
+    The at-risk set of the last sweep is kept in SQLite and each night's run is claimed by date,
+    so several web workers (or a cron job next to them) never send the same night's alerts twice.
+    """
+
+    def __init__(self, model=None, snapshot=snapshot, outbox=outbox, throttle=throttle, path=SWEEP_DB, at=SWEEP_AT):
+        self.model = model
+        self.snapshot = snapshot
+        self.outbox = outbox
+        self.throttle = throttle
+        self.path = path
+        self.at = at
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sweep_runs (
+                    run_date TEXT PRIMARY KEY,
+                    started_at REAL,
+                    finished_at REAL,
+                    status TEXT,
+                    summary TEXT
+                )
+            """)
+            conn.execute("CREATE TABLE IF NOT EXISTS at_risk (rno TEXT PRIMARY KEY, labels TEXT, flagged_at REAL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _claim(self, run_date, force):
+        with self._connect() as conn:
+            if force:
+                conn.execute("DELETE FROM sweep_runs WHERE run_date = ?", (run_date,))
+            try:
+                conn.execute("INSERT INTO sweep_runs VALUES (?, ?, NULL, 'running', NULL)", (run_date, time.time()))
+            except sqlite3.IntegrityError:
+                return False
+        return True
+
+    def run(self, force=False):
+        """Refresh, rescore, diff against the previous sweep and queue digests for new at-risk students.
+
+        Returns the run summary, or None when tonight's sweep was already claimed elsewhere.
+        """
+        run_date = datetime.now().strftime('%Y-%m-%d')
+        if not self._claim(run_date, force):
+            print(f"[INFO] Nightly sweep for {run_date} already ran; skipping")
+            return None
+
+        try:
+            summary = self._sweep(run_date)
+            status = 'completed'
+        except Exception as e:
+            summary, status = {"error": str(e)}, 'failed'
+            print(f"[ERR] Nightly sweep failed: {e}")
+        with self._connect() as conn:
+            conn.execute("UPDATE sweep_runs SET finished_at = ?, status = ?, summary = ? WHERE run_date = ?",
+                         (time.time(), status, json.dumps(summary), run_date))
+        return dict(summary, run_date=run_date, status=status)
+
+    def _sweep(self, run_date):
+        self.model = self.model or load_model()
+        self.snapshot.refresh()
+        df = self.snapshot.frame()
+        if df.empty:
+            return {"students": 0, "at_risk": 0, "newly_at_risk": 0, "emails_queued": 0}
+
+        # Rescore with the current model rather than trusting labels stored at import time
+        scored = self.model.predict_frame(df)
+        flags = need_alert(scored["performance_label"].to_numpy(),
+                           scored["risk_label"].to_numpy(),
+                           scored["dropout_label"].to_numpy())
+        flagged = df[flags].copy()
+        for head in HEADS:
+            flagged[head.upper()] = scored.loc[flags, head].to_numpy()
+
+        with self._connect() as conn:
+            previous = {rno for (rno,) in conn.execute("SELECT rno FROM at_risk")}
+            baseline = conn.execute("SELECT COUNT(*) FROM sweep_runs WHERE status = 'completed' AND run_date < ?",
+                                    (run_date,)).fetchone()[0] == 0
+        newly = flagged[~flagged.index.isin(list(previous))]
+
+        queued, suppressed, unassigned = [], {}, []
+        pending = flagged.index[:0]
+        if baseline:
+            # The very first sweep only records who is at risk; otherwise every mentor gets a backlog digest
+            print(f"[INFO] First nightly sweep: recorded {len(flagged)} at-risk students as the baseline")
+        elif len(newly) and smtp_pool.configured():
+            queued, suppressed, unassigned = queue_digests(newly, smtp_pool.user, self.outbox, self.throttle,
+                                                           kind="nightly-digest")
+        elif len(newly):
+            # Left out of the baseline, so they are still new (and alerted) once email works again
+            pending = newly.index
+            print(f"[WARN] Nightly sweep found {len(newly)} newly at-risk students but email is not configured; "
+                  f"they stay pending until it is")
+
+        # Tonight's set becomes the baseline; students who recovered drop out of it
+        now = time.time()
+        recorded = flagged.index.difference(pending)
+        with self._connect() as conn:
+            first_seen = dict(conn.execute("SELECT rno, flagged_at FROM at_risk").fetchall())
+            conn.execute("DELETE FROM at_risk")
+            conn.executemany("INSERT INTO at_risk VALUES (?, ?, ?)", [
+                (rno, json.dumps([str(flagged.at[rno, head.upper()]) for head in HEADS]), first_seen.get(rno, now))
+                for rno in recorded])
+
+        return {
+            "students": len(df),
+            "at_risk": len(flagged),
+            "newly_at_risk": 0 if baseline else len(newly),
+            "baseline": baseline,
+            "recovered": len(previous - set(flagged.index)),
+            "emails_queued": len(queued),
+            "pending": len(pending),
+            "suppressed": suppressed,
+            "no_mentor_email": len(unassigned),
+        }
+
+    def last_runs(self, limit=7):
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute("SELECT * FROM sweep_runs ORDER BY run_date DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(r, summary=json.loads(r['summary']) if r['summary'] else None) for r in rows]
+
+    def _loop(self):
+        while not self._stop.is_set():
+            wait = (next_run(self.at) - datetime.now()).total_seconds()
+            if self._stop.wait(max(wait, 0)):
+                return
+            try:
+                summary = self.run()
+                if summary:
+                    print(f"[INFO] Nightly sweep: {summary}")
+            except Exception as e:
+                print(f"[ERR] Nightly sweep failed: {e}")
+
+    def start(self):
+        """Run the sweep every night at `at` on a daemon thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="nightly-sweep", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nightly at-risk sweep: rescore all students and alert mentors "
+                                                 "about newly at-risk ones")
+    parser.add_argument("--once", action="store_true", help="run one sweep now and exit (for cron)")
+    parser.add_argument("--force", action="store_true", help="with --once, run even if tonight's sweep already ran")
+    args = parser.parse_args()
+
+    sweep = NightlySweep()
+    if not args.once:
+        print(f"Nightly sweep scheduled at {sweep.at} every day; next run {next_run(sweep.at)}")
+        sweep.start()
+        outbox.start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            return
+
+    summary = sweep.run(force=args.force)
+    if summary is None:
+        return
+    print(json.dumps(summary, indent=2))
+    # Give the outbox a chance to hand the digests to the mail server before the process exits
+    outbox.start()
+    deadline = time.time() + 120
+    while time.time() < deadline and any(outbox.counts().get(s) for s in ("queued", "sending")):
+        time.sleep(1)
+
+
+if __name__ == "__main__":
+    main()
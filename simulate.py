@@ -0,0 +1,231 @@
+import numpy as np
+import pandas as pd
+from model import FEATURES, HEADS, SCORES, feature_matrix, student_features
+
+# Adjustable inputs for the single-student what-if grid and their upper bounds
+WHATIF_FIELDS = ["ATTENDED_DAYS_CURR", "INTERNAL_MARKS", "BEHAVIOR_SCORE_10"]
+FIELD_MAX = {"INTERNAL_MARKS": 30.0, "BEHAVIOR_SCORE_10": 10.0}
+MAX_GRID_POINTS = 250000
+
+# Label severity, lower is better; used to tell improvements from regressions
+SEVERITY = {
+    "performance_label": {"high": 0, "medium": 1, "low": 2, "poor": 3},
+    "risk_label": {"low": 0, "medium": 1, "high": 2},
+    "dropout_label": {"low": 0, "medium": 1, "high": 2},
+}
+
+
+def _to_float(value, default):
+    try:
+        return default if value in (None, "") else float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def build_axis(spec, current, upper):
+    """Turn a {min, max, step} spec (or [min, max, step]) into a grid axis"""
+    if spec is None:
+        return np.array([current])
+    if isinstance(spec, (list, tuple)):
+        spec = dict(zip(["min", "max", "step"], spec))
+    if not isinstance(spec, dict):
+        raise ValueError("Ranges must be {min, max, step} objects")
+
+    lo = _to_float(spec.get("min"), current)
+    hi = _to_float(spec.get("max"), upper)
+    step = _to_float(spec.get("step"), 1.0)
+    if step <= 0:
+        raise ValueError("Range step must be positive")
+    lo, hi = max(0.0, min(lo, hi)), min(max(lo, hi), upper)
+
+    # Include the end point and always keep the student's current value on the axis
+    axis = np.arange(lo, hi + step / 2, step)
+    if lo <= current <= hi:
+        axis = np.union1d(axis, [current])
+    return np.round(axis, 4)
+
+
+def whatif_grid(model, student, ranges=None):
+    """Score every combination of the requested ranges for one student in a single pass"""
+    ranges = ranges or {f: {} for f in WHATIF_FIELDS}
+    if not isinstance(ranges, dict):
+        raise ValueError("Ranges must be an object keyed by field")
+    total_days = _to_float(student.get("TOTAL_DAYS_CURR"), 90.0)
+    bounds = dict(FIELD_MAX, ATTENDED_DAYS_CURR=total_days)
+
+    current = {f: _to_float(student.get(f), 0.0) for f in WHATIF_FIELDS}
+    axes = [build_axis(ranges.get(f), current[f], bounds[f]) for f in WHATIF_FIELDS]
+    shape = tuple(len(a) for a in axes)
+    if int(np.prod(shape)) > MAX_GRID_POINTS:
+        raise ValueError(f"Grid too large ({int(np.prod(shape))} points, max {MAX_GRID_POINTS})")
+
+    # Broadcast each axis along its own dimension, then score the flattened grid at once
+    attended = axes[0][:, None, None]
+    internal = axes[1][None, :, None]
+    behavior = axes[2][None, None, :]
+    base = student_features(student)[0]
+
+    X = np.empty(shape + (len(base),))
+    X[..., 0] = base[0]
+    X[..., 1] = internal / 30.0 * 100.0
+    X[..., 2] = attended / total_days * 100.0 if total_days > 0 else 0.0
+    X[..., 3] = behavior / 10.0 * 100.0
+    preds = model.predict(X.reshape(-1, len(base)))
+
+    now = model.predict(student_features(student))
+    result = {
+        "axes": {f: a.tolist() for f, a in zip(WHATIF_FIELDS, axes)},
+        "current": {
+            "values": current,
+            "scores": {name: round(float(now[name][0]), 1) for name in SCORES},
+            "predictions": {head: str(now[head][0]) for head in HEADS},
+        },
+        "surface": {},
+        "minimal_change": {},
+    }
+
+    # Cost of a grid point = summed change relative to each input's full scale
+    rel = [np.abs(a - current[f]) / (bounds[f] or 1.0) for f, a in zip(WHATIF_FIELDS, axes)]
+    cost = (rel[0][:, None, None] + rel[1][None, :, None] + rel[2][None, None, :]).ravel()
+
+    for head in HEADS:
+        labels = preds[head]
+        classes, codes = np.unique(labels, return_inverse=True)
+        result["surface"][head] = {
+            "classes": classes.tolist(),
+            "codes": codes.reshape(shape).tolist(),
+        }
+
+        current_label = str(now[head][0])
+        severity = np.array([SEVERITY[head].get(c, 0) for c in classes])[codes]
+        better = severity < SEVERITY[head].get(current_label, 0)
+        if not better.any():
+            result["minimal_change"][head] = None
+            continue
+
+        best = int(np.argmin(np.where(better, cost, np.inf)))
+        point = np.unravel_index(best, shape)
+        result["minimal_change"][head] = {
+            "label": str(labels[best]),
+            "values": {f: float(axes[i][point[i]]) for i, f in enumerate(WHATIF_FIELDS)},
+            "change": {f: round(float(axes[i][point[i]] - current[f]), 4) for i, f in enumerate(WHATIF_FIELDS)},
+        }
+
+    result["grid_points"] = int(np.prod(shape))
+    return result
+
+
+# Cohort adjustments are points on the derived percentages; raw fields are converted
+RAW_TO_FEATURE = {
+    "INTERNAL_MARKS": ("internal_pct", 100.0 / 30.0),
+    "BEHAVIOR_SCORE_10": ("behavior_pct", 10.0),
+}
+
+
+ADJUSTMENT_OPS = ("add", "scale", "set")
+
+
+def adjustment_spec(key, spec):
+    """Validate one adjustment: a number (added) or {add|scale|set: number}"""
+    if not isinstance(spec, dict):
+        spec = {"add": spec}
+    unknown = set(spec) - set(ADJUSTMENT_OPS)
+    if unknown or not spec:
+        raise ValueError(f"Adjustment for '{key}' must be a number or an object with add, scale or set")
+    out = {}
+    for op, value in spec.items():
+        # bool is an int subclass, but true/false is never a meaningful amount
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError(f"Adjustment '{op}' for '{key}' must be a number")
+        try:
+            out[op] = float(value)
+        except ValueError:
+            raise ValueError(f"Adjustment '{op}' for '{key}' must be a number, got '{value}'")
+        if not np.isfinite(out[op]):
+            raise ValueError(f"Adjustment '{op}' for '{key}' must be a finite number")
+    return out
+
+
+def apply_adjustments(X, adjustments, total_days=None):
+    """Return a copy of the feature matrix with {feature: delta | {add|scale|set: v}} applied"""
+    X = X.copy()
+    for key, spec in (adjustments or {}).items():
+        factor = 1.0
+        if key in FEATURES:
+            col = FEATURES.index(key)
+        elif key in RAW_TO_FEATURE:
+            name, factor = RAW_TO_FEATURE[key]
+            col = FEATURES.index(name)
+        elif key == "ATTENDED_DAYS_CURR":
+            col = FEATURES.index("attendance_pct")
+            days = np.asarray(total_days if total_days is not None else 90.0, dtype=float)
+            factor = np.where(days > 0, 100.0 / np.where(days > 0, days, 1.0), 0.0)
+        else:
+            raise ValueError(f"Unknown adjustment '{key}'")
+
+        spec = adjustment_spec(key, spec)
+        if "set" in spec:
+            X[:, col] = spec["set"] * factor
+        if "scale" in spec:
+            X[:, col] *= spec["scale"]
+        if "add" in spec:
+            X[:, col] += spec["add"] * factor
+
+    np.clip(X, 0.0, 100.0, out=X)
+    return X
+
+
+def _severity(labels, head):
+    classes, codes = np.unique(labels, return_inverse=True)
+    return np.array([SEVERITY[head].get(c, 0) for c in classes], dtype=int)[codes]
+
+
+def _distribution(labels, head):
+    counts = dict.fromkeys(SEVERITY[head], 0)
+    values, n = np.unique(labels, return_counts=True)
+    counts.update({str(v): int(c) for v, c in zip(values, n)})
+    return counts
+
+
+def cohort_intervention(model, df, adjustments):
+    """Rescore a cohort before and after an adjustment; returns label shifts and changed students"""
+    X = feature_matrix(df)
+    total_days = pd.to_numeric(df["TOTAL_DAYS_CURR"], errors='coerce').fillna(90.0).to_numpy() \
+        if "TOTAL_DAYS_CURR" in df.columns else None
+    before = model.predict(X)
+    after = model.predict(apply_adjustments(X, adjustments, total_days))
+
+    changed = np.zeros(len(df), dtype=bool)
+    distributions = {}
+    for head in HEADS:
+        changed |= before[head] != after[head]
+        shift = _severity(after[head], head) - _severity(before[head], head)
+        distributions[head] = {
+            "before": _distribution(before[head], head),
+            "after": _distribution(after[head], head),
+            "improved": int((shift < 0).sum()),
+            "worsened": int((shift > 0).sum()),
+        }
+
+    rnos = df["RNO"].astype(str).to_numpy() if "RNO" in df.columns else df.index.astype(str).to_numpy()
+    names = df["NAME"].astype(str).to_numpy() if "NAME" in df.columns else np.full(len(df), "")
+    students = []
+    for i in np.flatnonzero(changed):
+        students.append({
+            "RNO": str(rnos[i]),
+            "NAME": str(names[i]),
+            "before": {head: str(before[head][i]) for head in HEADS},
+            "after": {head: str(after[head][i]) for head in HEADS},
+        })
+
+    return {
+        "total_students": int(len(df)),
+        "distributions": distributions,
+        "avg_scores": {
+            name: {"before": round(float(before[name].mean()), 2) if len(df) else 0.0,
+                   "after": round(float(after[name].mean()), 2) if len(df) else 0.0}
+            for name in SCORES
+        },
+        "changed_count": len(students),
+        "changed": students,
+    }
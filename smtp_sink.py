@@ -0,0 +1,144 @@
+import time
+import argparse
+import threading
+import socketserver
+from email import message_from_bytes
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough of RFC 5321 for smtplib: EHLO with AUTH, MAIL/RCPT/DATA, RSET, NOOP, QUIT"""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        sink = self.server.sink
+        with sink._lock:
+            sink.connections += 1
+        self.reply("220 edumetric-sink ESMTP ready")
+        mail_from, rcpts = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command[:4].upper()
+
+            if verb == "EHLO":
+                self.reply("250-edumetric-sink")
+                self.reply("250-AUTH PLAIN LOGIN")
+                self.reply("250 8BITMIME")
+            elif verb == "HELO":
+                self.reply("250 edumetric-sink")
+            elif verb == "AUTH":
+                # Any credentials are accepted; LOGIN needs its two challenge rounds
+                if command.upper().startswith("AUTH LOGIN"):
+                    for _ in range(2 - len(command.split()[2:])):
+                        self.reply("334 ")
+                        self.rfile.readline()
+                self.reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                mail_from, rcpts = command[10:].strip(), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                rcpts.append(command[8:].strip())
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b".\r\n", b".\n"):
+                        break
+                    # Undo dot-stuffing
+                    lines.append(data[1:] if data.startswith(b"..") else data)
+                if sink.delay:
+                    time.sleep(sink.delay)
+                sink.record(mail_from, rcpts, b"".join(lines))
+                mail_from, rcpts = None, []
+                self.reply("250 OK: queued")
+            elif verb == "RSET":
+                mail_from, rcpts = None, []
+                self.reply("250 OK")
+            elif verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """Local SMTP server that accepts every message and keeps it in memory.
+
+    Point the app at it with SMTP_HOST=127.0.0.1, SMTP_PORT=<port>, SMTP_STARTTLS=False.
+    `delay` adds a fixed per-message pause to mimic a slow provider.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, delay=0.0, keep=1000):
+        self.delay = delay
+        self.keep = keep
+        self.messages = []
+        self.count = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _SMTPHandler)
+        self._server.sink = self
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    def record(self, mail_from, rcpts, data):
+        with self._lock:
+            self.count += 1
+            if len(self.messages) < self.keep:
+                self.messages.append({"from": mail_from, "to": rcpts, "message": message_from_bytes(data),
+                                      "received_at": time.time()})
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="smtp-sink", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local SMTP sink that prints every message it receives")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args()
+
+    sink = SMTPSink(args.host, args.port)
+    original = sink.record
+
+    def record(mail_from, rcpts, data):
+        original(mail_from, rcpts, data)
+        print(f"[INFO] #{sink.count} {mail_from} -> {', '.join(rcpts)}: {message_from_bytes(data)['Subject']}")
+
+    sink.record = record
+    print(f"SMTP sink listening on {args.host}:{args.port} (SMTP_STARTTLS=False)")
+    try:
+        sink._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import os
+import time
+import threading
+from collections import Counter
+import pandas as pd
+from db import load_students_df
+
+SNAPSHOT_TTL = int(os.getenv('SNAPSHOT_TTL_SECONDS', 300))
+
+# Columns that feed scoring, alerting and display; a change in any of them is a change to the row
+CONTENT_COLUMNS = [
+    'NAME', 'EMAIL', 'DEPT', 'YEAR', 'CURR_SEM', 'MENTOR', 'MENTOR_EMAIL',
+    'SEM1', 'SEM2', 'SEM3', 'SEM4', 'SEM5', 'SEM6', 'SEM7', 'SEM8',
+    'INTERNAL_MARKS', 'TOTAL_DAYS_CURR', 'ATTENDED_DAYS_CURR',
+    'PREV_ATTENDANCE_PERC', 'BEHAVIOR_SCORE_10',
+]
+
+
+TEXT_COLUMNS = {'NAME', 'EMAIL', 'DEPT', 'MENTOR', 'MENTOR_EMAIL',
+                'PERFORMANCE_LABEL', 'RISK_LABEL', 'DROPOUT_LABEL'}
+
+
+def row_hashes(df, columns=CONTENT_COLUMNS):
+    """64-bit content hash per row over the given columns, indexed like df"""
+    if df.empty:
+        return pd.Series(0, index=df.index, dtype='uint64')
+
+    # Canonicalize so "80", 80 and 80.0 hash the same whether they came from a CSV or the API
+    canon = pd.DataFrame(index=df.index)
+    for col in columns:
+        values = df[col] if col in df.columns else pd.Series(None, index=df.index, dtype=object)
+        if col in TEXT_COLUMNS:
+            canon[col] = values.fillna("").astype(str).str.strip()
+        else:
+            canon[col] = pd.to_numeric(values, errors='coerce').astype(float).round(4)
+    return pd.util.hash_pandas_object(canon, index=False)
+
+
+DIMENSION_COLUMNS = ['DEPT', 'YEAR']
+
+
+def dimension_values(df, column):
+    """Normalized department or year values of a frame, as counted by the dimension cache"""
+    if df.empty or column not in df.columns:
+        return []
+    values = df[column].dropna()
+    if column == 'YEAR':
+        return pd.to_numeric(values, errors='coerce').dropna().astype(int).tolist()
+    values = values.astype(str).str.strip()
+    return values[values != ""].tolist()
+
+
+class StudentSnapshot:
+    """In-memory copy of the students table, indexed by RNO and refreshed on a TTL"""
+
+    def __init__(self, loader=load_students_df, ttl=SNAPSHOT_TTL):
+        self.loader = loader
+        self.ttl = ttl
+        self.df = pd.DataFrame()
+        self.loaded_at = None
+        self._dirty = False
+        self._lock = threading.RLock()
+        # Held for the duration of a reload so only one thread downloads the table at a time
+        self._refreshing = threading.Lock()
+        self._counts = {column: Counter() for column in DIMENSION_COLUMNS}
+        self._dimensions = self._summarize()
+
+    def refresh(self):
+        """Reload the full table; keeps the previous copy if the load comes back empty"""
+        with self._refreshing:
+            return self._reload()
+
+    def _reload(self):
+        df = self.loader()
+        if df is None or df.empty or 'RNO' not in df.columns:
+            print("[WARN] Snapshot refresh returned no rows; keeping previous snapshot")
+            with self._lock:
+                if self.loaded_at is None:
+                    self.loaded_at = time.time()
+            return len(self.df)
+
+        df = df.copy()
+        df.columns = df.columns.str.upper()
+        df['RNO'] = df['RNO'].astype(str).str.strip()
+        df = df.drop_duplicates('RNO', keep='last').set_index('RNO', drop=False)
+        df.index.name = None
+
+        with self._lock:
+            self.df = df
+            self.loaded_at = time.time()
+            self._dirty = False
+            self._counts = {column: Counter(dimension_values(df, column)) for column in DIMENSION_COLUMNS}
+            self._dimensions = self._summarize()
+        return len(df)
+
+    def _count(self, rows, sign):
+        for column in DIMENSION_COLUMNS:
+            values = dimension_values(rows, column)
+            if sign > 0:
+                self._counts[column].update(values)
+            else:
+                self._counts[column].subtract(values)
+                # Unary plus drops the entries that reached zero
+                self._counts[column] = +self._counts[column]
+
+    def _summarize(self):
+        return {
+            "total_students": len(self.df),
+            "departments": sorted(self._counts['DEPT']),
+            "years": sorted(self._counts['YEAR']),
+            "department_counts": dict(sorted(self._counts['DEPT'].items())),
+            "year_counts": dict(sorted(self._counts['YEAR'].items())),
+            "loaded": self.loaded_at is not None,
+        }
+
+    def dimensions(self):
+        """Departments, years and counts as of the last refresh or write.
+
+        Kept up to date by refresh/upsert/remove, so reading it never touches the student
+        data or triggers a reload; treat the dict as read-only.
+        """
+        return self._dimensions
+
+    def invalidate(self):
+        """Force a reload on next access, e.g. after a bulk write upstream"""
+        self._dirty = True
+
+    def is_stale(self):
+        return self._dirty or self.loaded_at is None or time.time() - self.loaded_at > self.ttl
+
+    def age(self):
+        """Seconds since the last refresh, or None if never loaded"""
+        return None if self.loaded_at is None else time.time() - self.loaded_at
+
+    def upsert(self, rows):
+        """Write created/updated rows (uppercase columns incl. RNO) through to the snapshot.
+
+        Readers hold on to the frame they got, so the change is applied to a copy that is
+        swapped in; existing rows keep their position and any columns the write didn't carry.
+        """
+        if rows is None or rows.empty:
+            return
+        rows = rows.copy()
+        rows['RNO'] = rows['RNO'].astype(str).str.strip()
+        rows = rows.drop_duplicates('RNO', keep='last').set_index('RNO', drop=False)
+        rows.index.name = None
+
+        with self._lock:
+            # A reload is already due and will include the write
+            if self.loaded_at is None or self._dirty:
+                return
+            df = self.df.copy()
+            for col in rows.columns.difference(df.columns):
+                df[col] = None
+            known = rows.index.isin(df.index)
+            self._count(df.loc[rows.index[known]], -1)
+            if known.any():
+                df.loc[rows.index[known], rows.columns] = rows[known]
+            if not known.all():
+                df = pd.concat([df, rows[~known]])
+            # Count the merged rows, which keep any dept/year the write did not carry
+            self._count(df.loc[rows.index], +1)
+            self.df = df
+            self._dimensions = self._summarize()
+
+    def remove(self, rnos):
+        """Drop deleted students from the snapshot without a reload"""
+        with self._lock:
+            if self.loaded_at is None or self._dirty:
+                return
+            rnos = [str(r).strip() for r in rnos]
+            self._count(self.df.loc[self.df.index.intersection(rnos)], -1)
+            self.df = self.df.drop(index=rnos, errors='ignore')
+            self._dimensions = self._summarize()
+
+    def frame(self):
+        """Current snapshot DataFrame (index is RNO); treat it as read-only"""
+        if self.is_stale():
+            # Single flight: one caller reloads while the others keep serving the current frame;
+            # only when nothing has been loaded yet do they wait for it
+            if self._refreshing.acquire(blocking=self.loaded_at is None):
+                try:
+                    if self.is_stale():
+                        self._reload()
+                finally:
+                    self._refreshing.release()
+        return self.df
+
+    def get(self, rno):
+        """One student row as a dict, or None"""
+        df = self.frame()
+        rno = str(rno).strip()
+        if rno not in df.index:
+            return None
+        return df.loc[rno].to_dict()
+
+    def slice(self, dept=None, year=None):
+        """Rows for a department and/or year; empty filters match everything"""
+        df = self.frame()
+        if df.empty:
+            return df
+        mask = pd.Series(True, index=df.index)
+        if dept not in (None, "", "all") and 'DEPT' in df.columns:
+            mask &= df['DEPT'].astype(str).str.upper() == str(dept).upper()
+        if year not in (None, "", "all") and 'YEAR' in df.columns:
+            mask &= df['YEAR'].astype(str) == str(year)
+        return df[mask]
+
+
+snapshot = StudentSnapshot()
@@ -897,11 +897,19 @@ async function sendAlertEmailDirect() {
 
     showLoading("Sending mentor alert...");
     try {
-        const res = await api("/api/send-alert", "POST", payload);
+        // Not via api(): suppressed alerts come back as 409/429 with a message worth showing
+        const response = await fetch("/api/send-alert", {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify(payload)
+        });
+        const res = await response.json();
         hideLoading();
         
         if (res.success) {
-            alert("✅ Mentor alert sent successfully!");
+            alert("✅ Mentor alert queued for delivery!");
+        } else if (res.suppressed) {
+            alert("ℹ️ Alert not sent: " + res.message);
         } else {
             alert("❌ Failed to send alert: " + (res.message || "Unknown error"));
         }
@@ -2014,11 +2022,19 @@ async function uploadBatchFile(mode) {
     formData.append("file", selectedFileNormalize);
     formData.append("mode", mode);
     
-    showLoading("Normalizing data and generating predictions...");
+    showLoading("Uploading file...");
     
     try {
         const response = await fetch("/api/batch-upload", { method: "POST", body: formData });
-        const result = await response.json();
+        let result = await response.json();
+        
+        // Large imports run as a background job; poll it until it finishes
+        if (result.success && result.job_id) {
+            const job = await waitForJob(result.job_id);
+            result = job.status === 'completed'
+                ? { success: true, ...(job.result || {}), message: job.message }
+                : { success: false, message: job.message || "Import failed" };
+        }
         hideLoading();
         
         if (result.success) {
@@ -2057,6 +2073,31 @@ async function uploadBatchFile(mode) {
     }
 }
 
+async function waitForJob(jobId, intervalMs = 1000, timeoutMs = 60 * 60 * 1000) {
+    const deadline = Date.now() + timeoutMs;
+    while (true) {
+        if (Date.now() > deadline) {
+            return { status: 'failed', message: "Still processing on the server; check back later" };
+        }
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+        const response = await fetch(`/api/jobs/${jobId}`);
+        const result = await response.json();
+        if (!result.success) return { status: 'failed', message: result.message };
+        
+        const job = result.job;
+        if (job.status === 'completed' || job.status === 'failed') return job;
+        
+        let text = job.status === 'queued' ? "Waiting for an import worker..." : `Processed ${job.rows_processed}`;
+        if (job.status === 'running') {
+            if (job.total_rows) text += ` of ${job.total_rows}`;
+            text += ` rows (${Math.round(job.throughput)} rows/s`;
+            if (job.eta !== null) text += `, ETA ${Math.ceil(job.eta)}s`;
+            text += ")";
+        }
+        showLoading(text);
+    }
+}
+
 function showAnalyticsAfterNormalize() { 
     switchBatchMode('analytics'); 
     loadAnalyticsDashboard(); 
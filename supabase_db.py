@@ -1,3 +1,4 @@
+import io
 import psycopg2
 import pandas as pd
 from config import DATABASE_URL
@@ -31,7 +32,7 @@ def get_supabase_connection():
 
     try:
         # Use SSL for Supabase connections
-        conn = psycopg2.connect(DATABASE_URL, sslmode='require')
+        conn = psycopg2.connect(DATABASE_URL, sslmode='require', connect_timeout=10)
         return conn
     except Exception as e:
         print(f"[WARN] Direct Postgres connection failed: {e}")
@@ -141,6 +142,94 @@ def insert_student(student_data):
         print(f"Error inserting student: {e}")
         return False
 
+def students_columns(conn):
+    """Column names of the students table"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT column_name FROM information_schema.columns WHERE table_name = 'students'")
+    columns = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+    return columns
+
+def _merge_staging(cursor, columns):
+    """Upsert the staged rows into students on rno and drop the staging table"""
+    columns_str = ', '.join(columns)
+    # Keep the first staged row per rno, as dedupe_chunk() does; ON CONFLICT cannot touch the same row twice
+    updates = ', '.join(f"{c} = EXCLUDED.{c}" for c in columns if c != 'rno')
+    cursor.execute(f"""
+        INSERT INTO students ({columns_str})
+        SELECT DISTINCT ON (rno) {columns_str} FROM students_staging
+        WHERE rno IS NOT NULL
+        ORDER BY rno, ctid
+        ON CONFLICT (rno) DO {'UPDATE SET ' + updates if updates else 'NOTHING'}
+        RETURNING (xmax = 0)
+    """)
+    flags = [row[0] for row in cursor.fetchall()]
+    cursor.execute("DROP TABLE students_staging")
+    inserted = sum(1 for f in flags if f)
+    return inserted, len(flags) - inserted
+
+def bulk_load_students(chunks, conn=None, table_columns=None):
+    """Stream DataFrame chunks into students via COPY into a staging table, then upsert on rno.
+
+    Everything happens in one transaction, so a failed load leaves the table untouched.
+    Chunks are staged and merged per column set, so a chunk never writes NULL into a column
+    it did not carry. Pass an open `conn` (and its `table_columns`) to reuse a connection
+    across calls; it is committed but left open.
+    Returns {'rows', 'inserted', 'updated'}, or None when no direct connection is available.
+    """
+    owned = conn is None
+    if owned:
+        conn = get_supabase_connection()
+        if not conn:
+            return None
+
+    try:
+        cursor = conn.cursor()
+        table_columns = table_columns or students_columns(conn)
+
+        columns = None
+        rows = inserted = updated = 0
+        for df in chunks:
+            if df is None or df.empty:
+                continue
+            frame = df.copy()
+            frame.columns = frame.columns.str.lower()
+
+            # A chunk with a different header (e.g. another .xlsx sheet) gets its own staging table
+            chunk_columns = [c for c in frame.columns if c in table_columns and c != 'id']
+            if columns is None or set(chunk_columns) != set(columns):
+                if 'rno' not in chunk_columns:
+                    raise ValueError("Bulk load requires an rno column")
+                if columns is not None:
+                    counts = _merge_staging(cursor, columns)
+                    inserted, updated = inserted + counts[0], updated + counts[1]
+                columns = chunk_columns
+                columns_str = ', '.join(columns)
+                cursor.execute(f"CREATE TEMP TABLE students_staging ON COMMIT DROP AS "
+                               f"SELECT {columns_str} FROM students WITH NO DATA")
+
+            buf = io.StringIO()
+            frame[columns].to_csv(buf, index=False, header=False)
+            buf.seek(0)
+            cursor.copy_expert(f"COPY students_staging ({columns_str}) FROM STDIN WITH (FORMAT csv)", buf)
+            rows += len(frame)
+
+        if columns is None:
+            conn.rollback()
+            return {'rows': 0, 'inserted': 0, 'updated': 0}
+
+        counts = _merge_staging(cursor, columns)
+        conn.commit()
+        cursor.close()
+        return {'rows': rows, 'inserted': inserted + counts[0], 'updated': updated + counts[1]}
+    except Exception as e:
+        conn.rollback()
+        print(f"Error bulk loading students: {e}")
+        raise
+    finally:
+        if owned:
+            conn.close()
+
 def get_stats():
     """Get basic statistics from Supabase"""
     try:
@@ -0,0 +1,163 @@
+import os
+import time
+import sqlite3
+import threading
+from collections import defaultdict, deque
+
+# An identical alert (same student, mentor and labels) is not re-sent within this window
+ALERT_COOLDOWN = int(os.getenv('ALERT_COOLDOWN_SECONDS', 6 * 3600))
+# Emails per mentor per rolling hour; a digest counts as one email
+MENTOR_HOURLY_CAP = int(os.getenv('ALERT_MENTOR_HOURLY_CAP', 20))
+# SQLite file shared by every process on the host (gunicorn.conf.py sets one); unset keeps the
+# window in this process's memory only
+ALERT_THROTTLE_DB = os.getenv('ALERT_THROTTLE_DB', '')
+HOUR = 3600
+PRUNE_AT = 10000
+
+
+def alert_key(rno, mentor_email, labels):
+    return "|".join([str(rno).strip(), str(mentor_email).strip().lower()] +
+                    [str(label).strip().lower() for label in labels])
+
+
+class AlertThrottle:
+    """Dedup window and per-mentor hourly cap for outgoing alerts, with counts of what was suppressed.
+
+    With a `path`, every decision is made inside one SQLite write transaction against the
+    shared file, so several web workers (and the nightly sweep) see each other's sends.
+    """
+
+    def __init__(self, cooldown=ALERT_COOLDOWN, hourly_cap=MENTOR_HOURLY_CAP, path=ALERT_THROTTLE_DB):
+        self.cooldown = cooldown
+        self.hourly_cap = hourly_cap
+        self.path = path
+        self.suppressed = {"duplicate": 0, "rate_limited": 0}
+        self._sent = {}
+        self._mentor_sends = defaultdict(deque)
+        self._lock = threading.Lock()
+        if path:
+            self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS alert_sends (key TEXT PRIMARY KEY, mentor TEXT, sent_at REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS mentor_sends (mentor TEXT, sent_at REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS mentor_sends_mentor ON mentor_sends (mentor, sent_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS alert_sends_sent_at ON alert_sends (sent_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS suppressed (reason TEXT PRIMARY KEY, n INTEGER)")
+
+    def admit(self, mentor_email, students, now=None):
+        """Decide what may go out in one email to a mentor.
+
+        `students` is a list of (rno, labels) pairs. Returns (admitted, reason, duplicates):
+        the pairs not alerted to this mentor within the cooldown (recorded as sent), a reason
+        ('duplicate' or 'rate_limited') when nothing should be sent at all, and how many
+        pairs were dropped as duplicates.
+        """
+        now = time.time() if now is None else now
+        mentor = str(mentor_email).strip().lower()
+        if self.path:
+            return self._admit_shared(mentor, students, now)
+
+        with self._lock:
+            fresh = []
+            for rno, labels in students:
+                key = alert_key(rno, mentor, labels)
+                last = self._sent.get(key)
+                if last is not None and now - last < self.cooldown:
+                    self.suppressed["duplicate"] += 1
+                else:
+                    fresh.append((rno, labels, key))
+            duplicates = len(students) - len(fresh)
+            if not fresh:
+                return [], "duplicate", duplicates
+
+            sends = self._mentor_sends[mentor]
+            while sends and sends[0] <= now - HOUR:
+                sends.popleft()
+            if len(sends) >= self.hourly_cap:
+                self.suppressed["rate_limited"] += len(fresh)
+                return [], "rate_limited", duplicates
+
+            sends.append(now)
+            if len(self._sent) > PRUNE_AT:
+                self._sent = {k: t for k, t in self._sent.items() if now - t < self.cooldown}
+            for _, _, key in fresh:
+                self._sent[key] = now
+            return [(rno, labels) for rno, labels, _ in fresh], None, duplicates
+
+    def _admit_shared(self, mentor, students, now):
+        conn = self._connect()
+        try:
+            # Check and record under one write lock, so two workers cannot both admit the same alert
+            conn.execute("BEGIN IMMEDIATE")
+            fresh = []
+            for rno, labels in students:
+                key = alert_key(rno, mentor, labels)
+                row = conn.execute("SELECT sent_at FROM alert_sends WHERE key = ?", (key,)).fetchone()
+                if not row or now - row[0] >= self.cooldown:
+                    fresh.append((rno, labels, key))
+            duplicates = len(students) - len(fresh)
+            reason = None
+            if not fresh:
+                reason = "duplicate"
+            elif conn.execute("SELECT COUNT(*) FROM mentor_sends WHERE mentor = ? AND sent_at > ?",
+                              (mentor, now - HOUR)).fetchone()[0] >= self.hourly_cap:
+                reason = "rate_limited"
+
+            counts = {"duplicate": duplicates, "rate_limited": len(fresh) if reason == "rate_limited" else 0}
+            for name, n in counts.items():
+                if n:
+                    conn.execute("INSERT INTO suppressed VALUES (?, ?) ON CONFLICT (reason) DO UPDATE SET n = n + ?",
+                                 (name, n, n))
+            if reason is None:
+                conn.execute("DELETE FROM alert_sends WHERE sent_at <= ?", (now - self.cooldown,))
+                conn.execute("DELETE FROM mentor_sends WHERE sent_at <= ?", (now - HOUR,))
+                conn.executemany("INSERT OR REPLACE INTO alert_sends VALUES (?, ?, ?)",
+                                 [(key, mentor, now) for _, _, key in fresh])
+                conn.execute("INSERT INTO mentor_sends VALUES (?, ?)", (mentor, now))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        if reason:
+            return [], reason, duplicates
+        return [(rno, labels) for rno, labels, _ in fresh], None, duplicates
+
+    def release(self, keys):
+        """Forget alerts that will never be delivered, so they are not suppressed as duplicates"""
+        if not keys:
+            return
+        if self.path:
+            with self._connect() as conn:
+                conn.executemany("DELETE FROM alert_sends WHERE key = ?", [(k,) for k in keys])
+            return
+        with self._lock:
+            for key in keys:
+                self._sent.pop(key, None)
+
+    def stats(self):
+        if self.path:
+            with self._connect() as conn:
+                suppressed = dict(self.suppressed, **dict(conn.execute("SELECT reason, n FROM suppressed")))
+                tracked = conn.execute("SELECT COUNT(*) FROM alert_sends WHERE sent_at > ?",
+                                       (time.time() - self.cooldown,)).fetchone()[0]
+        else:
+            with self._lock:
+                suppressed, tracked = dict(self.suppressed), len(self._sent)
+        return {
+            "cooldown_seconds": self.cooldown,
+            "mentor_hourly_cap": self.hourly_cap,
+            "suppressed": suppressed,
+            "tracked_alerts": tracked,
+        }
+
+
+throttle = AlertThrottle()
@@ -0,0 +1,10 @@
+import os
+from app import app, warmup
+
+# With preload_app this runs once in the gunicorn master: the snapshot is loaded and the
+# aggregates primed before workers fork, so they share those pages copy-on-write, start out
+# ready (/readyz) and no first visitor pays for the cold fetch
+if os.getenv('PRELOAD_SNAPSHOT', 'True').lower() == 'true':
+    warmup()
+
+application = app